@@ -3,6 +3,15 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server, e.g. ``uvicorn config.asgi:application``. The
+like, comment, follow, like-state and autocomplete views are async and run
+on the event loop; the other views run in a thread pool.
+
+Under ASGI each request's ORM work runs on its own thread, so persistent
+connections would be left open per thread: connections default to
+per-request here (``DB_CONN_MAX_AGE=0``), with ``DB_POOL=True`` on
+PostgreSQL to reuse them.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +21,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,134 @@
+"""Database profile, driven by environment variables (python-decouple).
+
+``DB_ENGINE`` picks the backend: ``sqlite`` (default), ``postgresql`` or
+``mysql``. Every profile keeps connections open between requests
+(``DB_CONN_MAX_AGE`` seconds, checked before reuse when
+``DB_CONN_HEALTH_CHECKS`` is on) instead of reconnecting per request.
+
+SQLite is tuned for concurrent writes: WAL journaling lets readers run
+alongside the single writer, ``synchronous=NORMAL`` is durable in WAL mode
+while avoiding an fsync per commit, writers wait up to
+``SQLITE_BUSY_TIMEOUT`` seconds for the lock instead of failing with
+"database is locked", and transactions start with ``BEGIN IMMEDIATE`` so two
+transactions never deadlock upgrading read locks to write locks. Page cache
+and memory-mapped I/O sizes are configurable.
+
+On PostgreSQL ``DB_POOL=True`` uses Django's psycopg connection pool
+(requires ``psycopg[pool]``) in place of persistent connections.
+
+``DB_REPLICAS`` lists read replicas (``host[:port]`` for server databases,
+file paths for SQLite) that become the aliases ``replica1``, ``replica2``,
+... with the primary's other settings (see ``core.replicas``). Under test
+they mirror the primary.
+
+``describe()`` summarises the effective settings for ``manage.py db_report``.
+"""
+from decouple import config
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+
+def sqlite_pragmas():
+    """PRAGMA name -> value run on every new SQLite connection."""
+    return {
+        'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+        'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+        # Negative values are KiB rather than pages
+        'cache_size': -config('SQLITE_CACHE_SIZE_KB', default=65536, cast=int),
+        'mmap_size': config('SQLITE_MMAP_SIZE', default=268435456, cast=int),
+        'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+    }
+
+
+def _sqlite(base_dir):
+    pragmas = sqlite_pragmas()
+    return {
+        'ENGINE': ENGINES['sqlite'],
+        'NAME': config('DB_NAME', default=str(base_dir / 'db.sqlite3')),
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=5.0, cast=float),
+            'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+        },
+    }
+
+
+def _server(engine):
+    database = {
+        'ENGINE': ENGINES[engine],
+        'NAME': config('DB_NAME', default='socialhub'),
+        'USER': config('DB_USER', default=''),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default=''),
+        'OPTIONS': {},
+    }
+    if engine == 'postgresql':
+        connect_timeout = config('DB_CONNECT_TIMEOUT', default=5, cast=int)
+        database['OPTIONS']['connect_timeout'] = connect_timeout
+        if config('DB_POOL', default=False, cast=bool):
+            database['OPTIONS']['pool'] = {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=20, cast=int),
+                'timeout': connect_timeout,
+            }
+    return database
+
+
+def database_settings(base_dir):
+    """The ``DATABASES['default']`` entry for the configured profile."""
+    engine = config('DB_ENGINE', default='sqlite')
+    if engine not in ENGINES:
+        raise ValueError(f'DB_ENGINE must be one of {", ".join(ENGINES)}, not {engine!r}')
+    database = _sqlite(base_dir) if engine == 'sqlite' else _server(engine)
+    # A pool hands out connections itself; Django requires CONN_MAX_AGE = 0 with it
+    pooled = bool(database['OPTIONS'].get('pool'))
+    database['CONN_MAX_AGE'] = 0 if pooled else config('DB_CONN_MAX_AGE', default=60, cast=int)
+    database['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+    return database
+
+
+def replica_settings(primary):
+    """{alias: settings} of the read replicas listed in ``DB_REPLICAS``."""
+    replicas = {}
+    entries = [entry.strip() for entry in config('DB_REPLICAS', default='').split(',') if entry.strip()]
+    for number, entry in enumerate(entries, 1):
+        replica = {**primary, 'OPTIONS': dict(primary['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+        if primary['ENGINE'] == ENGINES['sqlite']:
+            replica['NAME'] = entry
+        else:
+            replica['HOST'], _, port = entry.partition(':')
+            replica['PORT'] = port or primary['PORT']
+        replicas[f'replica{number}'] = replica
+    return replicas
+
+
+def describe(connection):
+    """(setting, value) pairs describing ``connection`` as configured and as running."""
+    settings_dict = connection.settings_dict
+    rows = [
+        ('alias', connection.alias),
+        ('engine', settings_dict['ENGINE']),
+        ('name', str(settings_dict['NAME'])),
+        ('CONN_MAX_AGE', settings_dict['CONN_MAX_AGE']),
+        ('CONN_HEALTH_CHECKS', settings_dict['CONN_HEALTH_CHECKS']),
+    ]
+    options = settings_dict.get('OPTIONS', {})
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('SELECT sqlite_version()')
+            rows.append(('sqlite version', cursor.fetchone()[0]))
+            rows.append(('busy timeout (s)', options.get('timeout', 5)))
+            rows.append(('transaction mode', options.get('transaction_mode') or 'DEFERRED'))
+            for pragma in sqlite_pragmas():
+                cursor.execute(f'PRAGMA {pragma}')
+                rows.append((f'PRAGMA {pragma}', cursor.fetchone()[0]))
+        else:
+            rows.append(('host', f'{settings_dict["HOST"]}:{settings_dict["PORT"]}'))
+            rows.append(('server version', connection.get_database_version()))
+            rows.append(('pool', options.get('pool') or 'off'))
+    return rows
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config
 
+from .database import database_settings, replica_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInspectorMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,12 +80,17 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for concurrent writes by default; DB_ENGINE=postgresql/mysql
+# with DB_NAME, DB_USER, ... selects a server database (see config.database)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(BASE_DIR),
 }
+# Read replicas from DB_REPLICAS; the heavy read views use them (core.replicas)
+DATABASES.update(replica_settings(DATABASES['default']))
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a user reads from the primary after writing, to see their own changes
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
 
 
 # Password validation
@@ -125,6 +134,20 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per unique content under media/blobs/ (see core.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Resized/WebP variants of uploaded images: 'sync' processes them during the
+# upload request, 'deferred' leaves them for `manage.py process_images`
+IMAGE_PROCESSING = config('IMAGE_PROCESSING', default='sync')
+
 # Email configuration using Gmail SMTP and python-decouple
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -134,11 +157,61 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Notification outbox: failed sends are retried after OUTBOX_RETRY_DELAY
+# seconds, doubling each time, up to OUTBOX_MAX_ATTEMPTS attempts
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+OUTBOX_RETRY_DELAY = config('OUTBOX_RETRY_DELAY', default=60, cast=int)
+# Likes/comments/follows on the same post are grouped into one email once
+# the oldest of them is this many seconds old
+NOTIFICATION_COALESCE_WINDOW = config('NOTIFICATION_COALESCE_WINDOW', default=300, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Number of posts rendered per feed page
+FEED_PAGE_SIZE = config('FEED_PAGE_SIZE', default=20, cast=int)
+
+# Home timelines: authors with at least this many followers are not fanned
+# out on write; their posts are merged into followers' feeds at read time.
+TIMELINE_FANOUT_LIMIT = config('TIMELINE_FANOUT_LIMIT', default=10000, cast=int)
+# Number of recent posts copied into a timeline on follow and on rebuild
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', default=200, cast=int)
+# Entries kept per timeline by "manage.py trim_timelines"
+TIMELINE_MAX_ENTRIES = config('TIMELINE_MAX_ENTRIES', default=1000, cast=int)
+
+# Seconds a user's cached following/blocked id sets live (see users.graph).
+# Invalidation is explicit, so this only bounds staleness from other writers.
+SOCIAL_GRAPH_CACHE_TIMEOUT = config('SOCIAL_GRAPH_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Follow suggestions kept per user by "manage.py build_suggestions"
+FOLLOW_SUGGESTIONS_PER_USER = config('FOLLOW_SUGGESTIONS_PER_USER', default=20, cast=int)
+
+# Seconds cached feed card fragments are kept. Keys include the post and
+# profile cache versions, so this only controls memory use, not staleness.
+POST_CARD_CACHE_TIMEOUT = config('POST_CARD_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Trending posts and tags (posts.trending): engagement loses half its weight
+# every TRENDING_HALF_LIFE_HOURS; the sidebar lists are cached for
+# TRENDING_CACHE_TIMEOUT seconds
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=6.0, cast=float)
+TRENDING_CACHE_TIMEOUT = config('TRENDING_CACHE_TIMEOUT', default=60, cast=int)
+
+# Post search index: 'auto' (FTS5 on SQLite, tsvector on PostgreSQL),
+# 'sqlite_fts5', 'postgres' or 'none' for plain substring matching
+POST_SEARCH_BACKEND = config('POST_SEARCH_BACKEND', default='auto')
+
+# Per-request SQL instrumentation (core.middleware.QueryInspectorMiddleware):
+# query count/time headers, and a warning when one query shape runs at least
+# QUERY_INSPECTOR_REPEAT_THRESHOLD times from the same code (likely an N+1)
+QUERY_INSPECTOR = config('QUERY_INSPECTOR', default=DEBUG, cast=bool)
+QUERY_INSPECTOR_REPEAT_THRESHOLD = config('QUERY_INSPECTOR_REPEAT_THRESHOLD', default=5, cast=int)
+
+# Admin changelists of unfiltered tables with at least this many rows show an
+# estimated count instead of running COUNT(*) (core.paginator)
+ADMIN_EXACT_COUNT_LIMIT = config('ADMIN_EXACT_COUNT_LIMIT', default=50000, cast=int)
+
 # Custom error handlers
 HANDLER404 = 'core.views.custom_404'
 HANDLER500 = 'core.views.custom_error'
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .paginator import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables too big to count on every page view."""
+    paginator = EstimatedCountPaginator
+    # The "N total" link runs a second COUNT(*) over the whole table
+    show_full_result_count = False
@@ -0,0 +1,36 @@
+"""Timing statistics shared by the benchmark and load-test commands."""
+import json
+import math
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples_ms):
+    """min/median/mean/p95/p99/max of a list of millisecond timings."""
+    values = sorted(samples_ms)
+    return {
+        'count': len(values),
+        'min': round(values[0], 3) if values else 0.0,
+        'p50': round(percentile(values, 50), 3),
+        'mean': round(sum(values) / len(values), 3) if values else 0.0,
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(values[-1], 3) if values else 0.0,
+    }
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,39 @@
+"""Deployment checks for the database and cache profile (``manage.py check --deploy``)."""
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+
+@register(Tags.database, deploy=True)
+def check_database_profile(app_configs, databases=None, **kwargs):
+    warnings = []
+    for alias in databases or []:
+        settings_dict = connections[alias].settings_dict
+        options = settings_dict.get('OPTIONS', {})
+        if not settings_dict['CONN_MAX_AGE'] and not options.get('pool'):
+            warnings.append(Warning(
+                f'Database "{alias}" opens a new connection for every request.',
+                hint='Set DB_CONN_MAX_AGE (or DB_POOL=True on PostgreSQL).',
+                id='core.W001',
+            ))
+        if connections[alias].vendor == 'sqlite' and 'journal_mode=wal' not in options.get('init_command', '').lower():
+            warnings.append(Warning(
+                f'Database "{alias}" is SQLite without WAL journaling; concurrent writes will fail '
+                f'with "database is locked".',
+                hint='Leave SQLITE_JOURNAL_MODE at WAL, or use a server database.',
+                id='core.W002',
+            ))
+    return warnings
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    from users.graph import shared_cache
+
+    if shared_cache():
+        return []
+    return [Warning(
+        'The default cache is per process, so cache invalidations do not reach other workers.',
+        hint='Configure a shared CACHES backend (Redis, Memcached). Until then block lists are '
+             'read from the database on every request and other cached data can be stale.',
+        id='core.W003',
+    )]
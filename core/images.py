@@ -0,0 +1,168 @@
+"""Image derivative pipeline for uploaded post images and avatars.
+
+For an image field ``<name>`` the model carries ``<name>_width``,
+``<name>_height`` and ``<name>_variants``. Processing an upload:
+
+* applies the EXIF orientation and re-saves the original without metadata
+  (JPEG, including phone cameras' multi-picture MPO files, stays JPEG; PNG
+  and WebP keep their format and animations; anything else is re-encoded as
+  PNG or JPEG, so no upload keeps its EXIF/GPS data),
+* records the original's dimensions,
+* writes resized copies at the configured widths, each as WebP plus a
+  JPEG (or PNG, for images with transparency) fallback.
+
+``<name>_variants`` maps width -> {'webp': name, 'fallback': name, 'height': h}
+and is empty until the image has been processed, which is also how
+``manage.py process_images`` finds pending work when ``IMAGE_PROCESSING`` is
+'deferred'.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .storage import adjust_references
+
+# Fields that go through the pipeline, as (model label, field name)
+IMAGE_FIELDS = [
+    ('posts.Post', 'image'),
+    ('users.Profile', 'avatar'),
+]
+
+# Widths generated per field; enough for the sizes used in templates at 1x/2x.
+VARIANT_WIDTHS = {
+    'image': (400, 800, 1200),
+    'avatar': (50, 100, 200, 400),
+}
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Formats whose animations are re-encoded frame by frame; other multi-frame
+# files (MPO, TIFF pages, ...) keep only their first picture
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+
+
+def stored_names(name, variants):
+    """Every storage name used by one image field: the original and its variants."""
+    names = {name} if name else set()
+    for variant in (variants or {}).values():
+        names.update((variant['fallback'], variant['webp']))
+    return names
+
+
+def instance_names(instance, field_name):
+    return stored_names(getattr(instance, field_name).name, getattr(instance, f'{field_name}_variants'))
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _encode(img, fmt, **options):
+    buffer = BytesIO()
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _fallback(img):
+    """Encode as PNG when transparency matters, JPEG otherwise."""
+    if _has_alpha(img):
+        return 'png', _encode(img, 'PNG', optimize=True)
+    return 'jpg', _encode(img.convert('RGB'), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+
+def _stripped(img, original_format, name):
+    """The original re-encoded without EXIF/metadata, as (name, data)."""
+    if original_format in ('JPEG', 'MPO'):
+        return name, _encode(img.convert('RGB'), 'JPEG', quality=95, optimize=True)
+    if original_format in ('PNG', 'WEBP'):
+        return name, _encode(img, original_format)
+    ext, data = _fallback(img)
+    return f'{os.path.splitext(name)[0]}.{ext}', data
+
+
+def _replace_original(field_file, name, data):
+    """Store ``data`` in place of the uploaded original; return the new name."""
+    storage = field_file.storage
+    old_name = field_file.name
+    new_name = storage.save(name, ContentFile(data))
+    if new_name != old_name:
+        storage.delete(old_name)
+    return new_name
+
+
+def process_image(field_file, widths):
+    """Process one stored image; return (name, width, height, variants)."""
+    field_file.open('rb')
+    try:
+        with Image.open(field_file) as source:
+            original_format = source.format
+            animated = getattr(source, 'is_animated', False) and original_format in ANIMATED_FORMATS
+            if animated:
+                # Keep the frames but none of the metadata; no variants
+                width, height = source.size
+                data = _encode(source, original_format, save_all=True)
+            else:
+                img = ImageOps.exif_transpose(source)
+                img.load()
+    finally:
+        field_file.close()
+
+    if animated:
+        return _replace_original(field_file, field_file.name, data), width, height, {}
+
+    width, height = img.size
+    name = _replace_original(field_file, *_stripped(img, original_format, field_file.name))
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if _has_alpha(img) else 'RGB')
+    storage = field_file.storage
+    stem = os.path.splitext(os.path.basename(name))[0]
+    directory = os.path.join(os.path.dirname(name), 'variants')
+
+    variants = {}
+    targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+    for target in targets:
+        resized = img if target == width else img.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        ext, data = _fallback(resized)
+        webp = _encode(resized, 'WEBP', quality=WEBP_QUALITY, method=6)
+        variants[str(target)] = {
+            'height': resized.size[1],
+            'fallback': storage.save(os.path.join(directory, f'{stem}_{target}w.{ext}'), ContentFile(data)),
+            'webp': storage.save(os.path.join(directory, f'{stem}_{target}w.webp'), ContentFile(webp)),
+        }
+    return name, width, height, variants
+
+
+def process_instance_image(instance, field_name):
+    """Process ``instance.<field_name>`` and store the results on the row."""
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+    before = instance_names(instance, field_name)
+    name, width, height, variants = process_image(field_file, VARIANT_WIDTHS[field_name])
+    values = {
+        field_name: name,
+        f'{field_name}_width': width,
+        f'{field_name}_height': height,
+        f'{field_name}_variants': variants,
+    }
+    # A queryset update keeps this out of the model's save() signals; bumping
+    # cache_version refreshes the cached feed fragments that show the image.
+    type(instance).objects.filter(pk=instance.pk).update(
+        cache_version=F('cache_version') + 1, **values
+    )
+    for attr, value in values.items():
+        setattr(instance, attr, value)
+    adjust_references(before, instance_names(instance, field_name))
+
+
+def schedule_image_processing(instance, field_name):
+    """Process a freshly uploaded image now, or leave it for ``process_images``."""
+    if settings.IMAGE_PROCESSING == 'sync':
+        process_instance_image(instance, field_name)
@@ -0,0 +1,147 @@
+"""Load-test workers.
+
+Each worker process runs a share of the virtual users as threads. A virtual
+user logs in once (unless anonymous), then repeatedly picks an action from
+the traffic mix, sends the request with ``urllib`` and records its latency
+under the route's name for the level's duration. Redirects are not followed,
+so a write is timed on its own rather than together with the page it
+redirects to.
+
+This module only uses the standard library so worker processes start
+without Django, whatever the multiprocessing start method.
+"""
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# action -> whether it needs a logged-in user
+ACTIONS = {
+    'feed': False,
+    'following': True,
+    'post': False,
+    'profile': False,
+    'search': False,
+    'like': True,
+    'comment': True,
+    'follow': True,
+}
+
+DEFAULT_MIX = 'feed=35,following=10,post=15,profile=10,search=10,like=10,comment=5,follow=5'
+
+
+def parse_mix(value):
+    """'feed=35,like=10' -> {'feed': 35.0, 'like': 10.0}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f'Unknown action {name!r}; choose from {", ".join(ACTIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, plan, credentials, rng):
+        self.plan = plan
+        self.credentials = credentials
+        self.rng = rng
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect
+        )
+        actions = [name for name in plan['mix'] if credentials or not ACTIONS[name]]
+        self.actions = actions
+        self.weights = [plan['mix'][name] for name in actions]
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None):
+        """Send one request; return its status code (0 for connection errors)."""
+        url = self.plan['base_url'] + path
+        headers = {}
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self._csrf_token()
+            headers['Referer'] = url
+        request = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.plan['timeout']) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+    def login(self):
+        routes = self.plan['routes']
+        self.request(routes['login'])
+        username, password = self.credentials
+        status = self.request(routes['login'], {'username': username, 'password': password})
+        return status in (301, 302)
+
+    def next_request(self):
+        """Pick an action and return (route name, path, POST data or None)."""
+        routes, rng = self.plan['routes'], self.rng
+        action = rng.choices(self.actions, self.weights)[0]
+        post_id = rng.choice(self.plan['post_ids'])
+        if action == 'feed':
+            return 'home_feed', routes['feed'], None
+        if action == 'following':
+            return 'home_feed (following)', routes['feed'] + '?feed=following', None
+        if action == 'post':
+            return 'post_detail', routes['post'].format(post_id), None
+        if action == 'profile':
+            return 'profile', routes['profile'].format(rng.choice(self.plan['usernames'])), None
+        if action == 'search':
+            return 'search_users', routes['search'] + '?q=' + rng.choice(self.plan['search_terms']), None
+        if action == 'like':
+            return 'like_post', routes['like'].format(post_id), {}
+        if action == 'comment':
+            return 'add_comment', routes['comment'].format(post_id), {'text': 'Load test comment'}
+        return 'follow_user', routes['follow'].format(rng.choice(self.plan['user_ids'])), None
+
+    def run(self, samples):
+        # Logging in (password hashing) is not part of the measured window.
+        if self.credentials and not self.login():
+            samples.append(('login', 0.0, 0))
+            return
+        deadline = time.monotonic() + self.plan['duration']
+        while time.monotonic() < deadline:
+            route, path, data = self.next_request()
+            start = time.perf_counter()
+            status = self.request(path, data)
+            samples.append((route, (time.perf_counter() - start) * 1000, status))
+            if self.plan['think_time']:
+                time.sleep(self.rng.uniform(0, 2 * self.plan['think_time']))
+
+
+def run_worker(plan, credentials, seed):
+    """Run one thread per entry of ``credentials`` (None = anonymous) for
+    ``plan['duration']`` seconds; return [(route, latency ms, status)]."""
+    samples = []
+    threads = []
+    for index, user_credentials in enumerate(credentials):
+        user = VirtualUser(plan, user_credentials, random.Random(seed * 1000 + index))
+        thread = threading.Thread(target=user.run, args=(samples,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(plan['duration'] + plan['timeout'] * 3)
+    return list(samples)
@@ -0,0 +1,170 @@
+import platform
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+
+from core.bench import load_results, save_results, summarize
+from core.queries import QueryRecorder
+from core.synthetic import generate
+from posts.models import Post
+
+User = get_user_model()
+
+VIEWS = ('home_feed', 'home_feed_following', 'post_detail', 'profile_view', 'search_users', 'like_post')
+
+
+def _scenarios(size_prefix):
+    """The viewer and (name, method, url) of each benchmarked request.
+
+    Each view is pointed at the expensive end of the data: the viewer who
+    follows the most people, the most discussed post, the most followed
+    profile.
+    """
+    viewer = User.objects.annotate(n=Count('following')).order_by('-n', 'pk').first()
+    busiest_post = Post.objects.visible_to(viewer).order_by('-comment_count', 'pk').first()
+    liked_post = Post.objects.visible_to(viewer).order_by('-like_count', 'pk').first()
+    popular = (
+        User.objects.exclude(pk=viewer.pk)
+        .exclude(settings__profile_visible=False)
+        .annotate(n=Count('followers'))
+        .order_by('-n', 'pk')
+        .first()
+    )
+    feed = reverse('posts:home_feed')
+    return viewer, [
+        ('home_feed', 'get', feed),
+        ('home_feed_following', 'get', f'{feed}?feed=following'),
+        ('post_detail', 'get', reverse('posts:post_detail', args=[busiest_post.pk])),
+        ('profile_view', 'get', reverse('users:profile', args=[popular.username])),
+        ('search_users', 'get', f"{reverse('posts:search_users')}?q={size_prefix}1"),
+        ('like_post', 'post', reverse('posts:like_post', args=[liked_post.pk])),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Time the main views against synthetic data sets of several sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000',
+                            help='Comma-separated numbers of users to generate (default: 100,1000).')
+        parser.add_argument('--views', default=','.join(VIEWS),
+                            help=f'Comma-separated subset of: {", ".join(VIEWS)}.')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per view.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per view first.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='bench-results.json', help='Where to write the results.')
+        parser.add_argument('--baseline', help='Earlier results file to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed median slowdown before a view counts as regressed (default 0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        views = [name for name in options['views'].split(',') if name]
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise CommandError(f'Unknown views: {", ".join(sorted(unknown))}')
+
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'sizes': {},
+        }
+
+        setup_test_environment()
+        try:
+            for size in sizes:
+                self.stdout.write(f'Generating {size} users...')
+                results['sizes'][str(size)] = self.run_size(size, views, options)
+        finally:
+            teardown_test_environment()
+
+        save_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
+
+        if options['baseline']:
+            regressions = self.compare(results, load_results(options['baseline']), options['tolerance'])
+            if regressions:
+                raise CommandError(f'{regressions} view(s) regressed against {options["baseline"]}.')
+
+    def run_size(self, size, views, options):
+        """Benchmark every view against a fresh test database of ``size`` users."""
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            cache.clear()
+            data = generate(users=size, prefix='bench', seed=options['seed'])
+            viewer, scenarios = _scenarios('bench')
+
+            # The inspector's stack capture would dominate the timings.
+            with override_settings(QUERY_INSPECTOR=False):
+                client = Client()
+                client.force_login(viewer)
+                timings = {}
+                for name, method, url in scenarios:
+                    if name in views:
+                        timings[name] = self.time_view(client, method, url, options)
+                        self.stdout.write(
+                            f'  {name:<22} p50 {timings[name]["p50"]:8.2f} ms  '
+                            f'p95 {timings[name]["p95"]:8.2f} ms  {timings[name]["queries"]} queries'
+                        )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        return {'data': data, 'views': timings}
+
+    def time_view(self, client, method, url, options):
+        request = getattr(client, method)
+        for _ in range(options['warmup']):
+            request(url)
+
+        with QueryRecorder(capture_stacks=False) as recorder:
+            response = request(url)
+        if response.status_code != 200:
+            raise CommandError(f'{method.upper()} {url} returned {response.status_code}')
+
+        samples = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            request(url)
+            samples.append((time.perf_counter() - start) * 1000)
+        return {**summarize(samples), 'queries': recorder.count}
+
+    def compare(self, results, baseline, tolerance):
+        """Print current vs baseline medians and query counts; return the number of regressions."""
+        self.stdout.write(f'\n{"users":>7}  {"view":<22} {"base p50":>9} {"p50":>9} {"change":>8}  queries')
+        regressions = 0
+        for size, current in results['sizes'].items():
+            base = baseline.get('sizes', {}).get(size)
+            if base is None:
+                continue
+            for name, stats in current['views'].items():
+                old = base['views'].get(name)
+                if old is None:
+                    continue
+                change = stats['p50'] / old['p50'] - 1 if old['p50'] else 0.0
+                slower = change > tolerance
+                more_queries = stats['queries'] > old['queries']
+                line = (
+                    f'{size:>7}  {name:<22} {old["p50"]:9.2f} {stats["p50"]:9.2f} {change:+8.1%}  '
+                    f'{old["queries"]} -> {stats["queries"]}'
+                )
+                if slower or more_queries:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from config.database import describe
+
+
+class Command(BaseCommand):
+    help = 'Show the effective database settings, as configured and as reported by the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append',
+                            help='Only report this alias (may be repeated; default: all).')
+
+    def handle(self, *args, **options):
+        for alias in options['database'] or list(connections):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Database "{alias}"'))
+            for name, value in describe(connections[alias]):
+                self.stdout.write(f'  {name:<22} {value}')
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from core.plans import check_plans
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the hot querysets registered in each app\'s hot_queries module and fail '
+            'if any of them scans a whole table or sorts every matching row.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only check these queries.')
+        parser.add_argument('--existing', action='store_true',
+                            help='Explain against the configured database instead of a fresh, migrated test database.')
+        parser.add_argument('--show-plans', action='store_true', help='Print every plan, not just problems.')
+
+    def handle(self, *args, **options):
+        old_config = None
+        if not options['existing']:
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            # Plans only depend on the ids used, not on the viewer existing
+            viewer = User(pk=1, username='explain')
+            plans = check_plans(viewer, options['names'])
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+
+        failed = 0
+        for plan in plans:
+            if plan.problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{plan.name}: {"; ".join(plan.problems)}'))
+                if plan.suggestion:
+                    self.stdout.write(f'  {plan.suggestion}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{plan.name}: ok'))
+            if plan.problems or options['show_plans']:
+                for line in plan.lines:
+                    self.stdout.write(f'    {line}')
+        if failed:
+            raise CommandError(f'{failed} of {len(plans)} hot queries are not served by an index.')
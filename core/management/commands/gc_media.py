@@ -0,0 +1,125 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.images import IMAGE_FIELDS, stored_names
+from core.models import MediaBlob
+from core.storage import BLOB_ROOT, ContentAddressedStorage, adjust_references, is_blob
+
+
+class Command(BaseCommand):
+    help = 'Recount media blob references and delete blobs nothing refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced blobs saved more recently than this (uploads in flight).')
+        parser.add_argument('--adopt-legacy', action='store_true',
+                            help='Move files saved before content addressing into the blob store first.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be deleted without deleting anything.')
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('The default storage is not ContentAddressedStorage.')
+
+        if options['adopt_legacy']:
+            self.adopt_legacy(storage, options['dry_run'])
+
+        references = self.recount()
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        orphans = MediaBlob.objects.filter(ref_count__lte=0, last_seen_at__lt=cutoff)
+        freed = 0
+        deleted = 0
+        for pk, name, size in list(orphans.values_list('pk', 'name', 'size')):
+            if options['dry_run']:
+                freed += size
+                deleted += 1
+                continue
+            with transaction.atomic():
+                # The conditional DELETE re-checks the row: a save since the
+                # list was taken refreshed last_seen_at or took a reference.
+                # The file goes before the commit, so a save waiting on the
+                # row writes it again.
+                if orphans.filter(pk=pk).delete()[0]:
+                    storage.delete_blob(name)
+                    freed += size
+                    deleted += 1
+
+        # Files left behind by a crash between writing the blob and recording it
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        stray = 0
+        for name in self.blob_files(storage):
+            if name in known or name in references:
+                continue
+            modified = storage.get_modified_time(name)
+            if modified < cutoff:
+                stray += 1
+                if not options['dry_run']:
+                    storage.delete_blob(name)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} orphaned blob(s) ({freed} bytes) and {stray} unrecorded file(s).'
+        ))
+
+    def recount(self):
+        """Rebuild every MediaBlob.ref_count from the image fields; return the counts.
+
+        Each count is only overwritten if it still holds the value read before
+        the image fields were scanned; a blob whose count moved meanwhile is
+        left for the next run.
+        """
+        snapshot = list(MediaBlob.objects.values_list('pk', 'name', 'ref_count'))
+        references = Counter()
+        for label, field_name in IMAGE_FIELDS:
+            rows = apps.get_model(label).objects.values_list(field_name, f'{field_name}_variants')
+            for name, variants in rows.iterator():
+                references.update(n for n in stored_names(name, variants) if is_blob(n))
+
+        for pk, name, ref_count in snapshot:
+            if references[name] != ref_count:
+                MediaBlob.objects.filter(pk=pk, ref_count=ref_count).update(ref_count=references[name])
+        return references
+
+    def adopt_legacy(self, storage, dry_run):
+        """Re-store pre-existing uploads as blobs, collapsing duplicate copies."""
+        adopted = {}
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            legacy = model.objects.exclude(**{f'{field_name}__startswith': BLOB_ROOT + '/'}).exclude(
+                **{field_name: ''}
+            ).exclude(**{f'{field_name}__isnull': True})
+            for instance in legacy.iterator():
+                old_name = getattr(instance, field_name).name
+                if not storage.exists(old_name):
+                    self.stderr.write(f'{label} {instance.pk}: missing file {old_name}')
+                    continue
+                if dry_run:
+                    adopted[old_name] = None
+                    continue
+                if old_name not in adopted:
+                    with storage.open(old_name) as source:
+                        adopted[old_name] = storage.save(old_name, source)
+                model.objects.filter(pk=instance.pk).update(**{field_name: adopted[old_name]})
+                adjust_references(set(), {adopted[old_name]})
+
+        if not dry_run:
+            for old_name in adopted:
+                storage.delete(old_name)
+        unique = len(set(adopted.values())) if not dry_run else '?'
+        self.stdout.write(f'Adopted {len(adopted)} legacy file(s) into {unique} blob(s).')
+
+    def blob_files(self, storage):
+        root = storage.path(BLOB_ROOT)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                full_path = os.path.join(directory, filename)
+                yield os.path.relpath(full_path, storage.location).replace(os.sep, '/')
@@ -0,0 +1,228 @@
+import importlib.util
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.bench import summarize
+from core.loadtest import DEFAULT_MIX, parse_mix, run_worker
+from core.synthetic import PASSWORD
+from posts.models import Post
+
+User = get_user_model()
+
+SAMPLE_SIZE = 2000
+
+# --server mode -> (description, command line after the Python executable)
+SERVERS = {
+    'wsgi': ('runserver (WSGI, a thread per connection)',
+             lambda port: [os.path.join(settings.BASE_DIR, 'manage.py'), 'runserver',
+                           f'127.0.0.1:{port}', '--noreload']),
+    'asgi': ('uvicorn (ASGI, one event loop)',
+             lambda port: ['-m', 'uvicorn', 'config.asgi:application', '--host', '127.0.0.1',
+                           '--port', str(port), '--log-level', 'warning']),
+}
+
+
+def _route(name, sentinel):
+    """A URL from the URL conf with its single argument replaced by '{}'."""
+    return reverse(name, args=[sentinel]).replace(str(sentinel), '{}')
+
+
+def _split(items, parts):
+    return [items[index::parts] for index in range(parts)]
+
+
+class Command(BaseCommand):
+    help = 'Drive a local server with a mix of anonymous and logged-in traffic and report latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server (default: start one on --port).')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--server', choices=SERVERS, default='wsgi',
+                            help='Server to start: runserver (wsgi) or uvicorn (asgi, requires uvicorn).')
+        parser.add_argument('--compare', action='store_true',
+                            help='Run every level against both servers and compare them.')
+        parser.add_argument('--users', default='1,4,16',
+                            help='Comma-separated concurrent virtual user counts to step through.')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                            help='Worker processes; virtual users are spread across them as threads.')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds per concurrency level.')
+        parser.add_argument('--anonymous', type=float, default=0.3,
+                            help='Fraction of virtual users that do not log in.')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Relative action weights (default: {DEFAULT_MIX}).')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='Mean pause in seconds between a virtual user\'s requests.')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--username-prefix', default='user',
+                            help='Log in as seed_data users with this prefix (password "%s").' % PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        levels = [int(level) for level in options['users'].split(',') if level]
+        modes = list(SERVERS) if options['compare'] else [options['server']]
+        if options['url'] and options['compare']:
+            raise CommandError('--compare starts its own servers; it cannot be used with --url.')
+        if 'asgi' in modes and not options['url'] and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('The ASGI server needs uvicorn: pip install uvicorn')
+
+        accounts = list(
+            User.objects.filter(username__startswith=options['username_prefix'], is_active=True)
+            .order_by('pk').values_list('pk', 'username')[:SAMPLE_SIZE]
+        )
+        post_ids = list(Post.objects.order_by('-timestamp').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        if not accounts or not post_ids:
+            raise CommandError('No users or posts to use; run "manage.py seed_data" first.')
+        usernames = [username for _, username in accounts]
+
+        plan = {
+            'mix': mix,
+            'duration': options['duration'],
+            'think_time': options['think_time'],
+            'timeout': options['timeout'],
+            'post_ids': post_ids,
+            'user_ids': [pk for pk, _ in accounts],
+            'usernames': usernames,
+            'search_terms': sorted({username[:len(options['username_prefix']) + 1] for username in usernames}),
+            'routes': {
+                'login': reverse('users:login'),
+                'feed': reverse('posts:home_feed'),
+                'search': reverse('posts:search_users'),
+                'post': _route('posts:post_detail', 987654321),
+                'like': _route('posts:like_post', 987654321),
+                'comment': _route('posts:add_comment', 987654321),
+                'follow': _route('posts:follow_user', 987654321),
+                'profile': _route('users:profile', '__username__'),
+            },
+        }
+
+        results = {'mix': mix, 'servers': {}}
+        for mode in modes:
+            results['servers'][mode] = self.run_server(mode, plan, levels, usernames, options)
+        if options['compare']:
+            self.report_comparison(results['servers'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}.')
+
+    def run_server(self, mode, plan, levels, usernames, options):
+        """Step through the levels against one server; return its results."""
+        server = None
+        if options['url']:
+            plan['base_url'] = options['url'].rstrip('/')
+        else:
+            plan['base_url'] = f'http://127.0.0.1:{options["port"]}'
+            self.stdout.write(f'\nStarting {SERVERS[mode][0]}...')
+            server = self.start_server(mode, options['port'], plan['base_url'] + plan['routes']['login'])
+
+        results = {'base_url': plan['base_url'], 'levels': {}}
+        try:
+            for level in levels:
+                self.stdout.write(f'\n{level} virtual user(s) for {options["duration"]:g}s...')
+                results['levels'][str(level)] = self.run_level(plan, level, usernames, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(10)
+
+        self.report_saturation(results['levels'])
+        return results
+
+    def start_server(self, mode, port, probe_url):
+        """Start the ``mode`` server in a subprocess and wait until it answers."""
+        env = dict(os.environ, QUERY_INSPECTOR='False')
+        server = subprocess.Popen(
+            [sys.executable, *SERVERS[mode][1](port)],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The {mode} server exited during startup.')
+            try:
+                urllib.request.urlopen(probe_url, timeout=1).read()
+                return server
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'The {mode} server did not start within 30 seconds.')
+
+    def run_level(self, plan, level, usernames, options):
+        anonymous = round(level * options['anonymous'])
+        credentials = [None] * anonymous + [
+            (usernames[index % len(usernames)], PASSWORD) for index in range(level - anonymous)
+        ]
+        processes = max(1, min(options['processes'], level))
+        batches = _split(credentials, processes)
+        with multiprocessing.Pool(processes) as pool:
+            outputs = pool.starmap(run_worker, [
+                (plan, batch, options['seed'] * 100 + index) for index, batch in enumerate(batches)
+            ])
+
+        by_route = defaultdict(list)
+        errors = defaultdict(int)
+        for route, latency, status in (sample for output in outputs for sample in output):
+            by_route[route].append(latency)
+            if not 200 <= status < 400:
+                errors[route] += 1
+
+        duration = options['duration']
+        total = sum(len(latencies) for latencies in by_route.values())
+        routes = {}
+        self.stdout.write(f'{"route":<24} {"requests":>8} {"errors":>6} {"req/s":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for route in sorted(by_route):
+            stats = summarize(by_route[route])
+            stats.update(errors=errors[route], rps=round(stats['count'] / duration, 2))
+            routes[route] = stats
+            self.stdout.write(f'{route:<24} {stats["count"]:>8} {stats["errors"]:>6} {stats["rps"]:>8.1f} '
+                              f'{stats["p50"]:>8.1f} {stats["p95"]:>8.1f} {stats["p99"]:>8.1f}')
+        overall = summarize([latency for latencies in by_route.values() for latency in latencies])
+        overall.update(errors=sum(errors.values()), rps=round(total / duration, 2))
+        self.stdout.write(self.style.SUCCESS(
+            f'{"all":<24} {total:>8} {overall["errors"]:>6} {overall["rps"]:>8.1f} '
+            f'{overall["p50"]:>8.1f} {overall["p95"]:>8.1f} {overall["p99"]:>8.1f}'
+        ))
+        return {'routes': routes, 'overall': overall}
+
+    def report_saturation(self, levels):
+        """Point out where adding users stopped adding throughput."""
+        previous = None
+        for level, result in levels.items():
+            rps = result['overall']['rps']
+            if previous and rps < previous[1] * 1.1:
+                self.stdout.write(self.style.WARNING(
+                    f'\nThroughput saturates around {previous[0]} virtual users '
+                    f'({previous[1]:.1f} req/s; {rps:.1f} req/s at {level}).'
+                ))
+                return
+            previous = (level, rps)
+        if previous:
+            self.stdout.write(f'\nNo saturation up to {previous[0]} virtual users ({previous[1]:.1f} req/s).')
+
+    def report_comparison(self, servers):
+        """Throughput, p95 latency and errors of each server side by side."""
+        self.stdout.write(f'\n{"users":>6} {"wsgi req/s":>11} {"asgi req/s":>11} '
+                          f'{"wsgi p95":>9} {"asgi p95":>9} {"wsgi err":>9} {"asgi err":>9}')
+        wsgi, asgi = servers['wsgi']['levels'], servers['asgi']['levels']
+        for level in wsgi:
+            w, a = wsgi[level]['overall'], asgi[level]['overall']
+            self.stdout.write(f'{level:>6} {w["rps"]:>11.1f} {a["rps"]:>11.1f} '
+                              f'{w["p95"]:>9.1f} {a["p95"]:>9.1f} {w["errors"]:>9} {a["errors"]:>9}')
@@ -0,0 +1,29 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_FIELDS, process_instance_image
+
+
+class Command(BaseCommand):
+    help = 'Generate resized/WebP variants for uploaded images that have not been processed yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Reprocess every image, not only pending ones.')
+
+    def handle(self, *args, **options):
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            pending = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            if not options['all']:
+                pending = pending.filter(**{f'{field_name}_variants': {}})
+
+            done = failed = 0
+            for instance in pending.iterator(chunk_size=100):
+                try:
+                    process_instance_image(instance, field_name)
+                    done += 1
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f'{label} {instance.pk}: {exc}')
+            self.stdout.write(f'{label}.{field_name}: {done} processed, {failed} failed')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.synthetic import PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, follows, posts and engagement.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts-per-user', type=int, default=10, help='Average posts per user.')
+        parser.add_argument('--follows-per-user', type=int, default=30, help='Average follows per user.')
+        parser.add_argument('--likes-per-post', type=int, default=5, help='Average likes per post.')
+        parser.add_argument('--comments-per-post', type=int, default=2, help='Average comments per post.')
+        parser.add_argument('--tags', type=int, default=200, help='Size of the tag vocabulary.')
+        parser.add_argument('--days', type=int, default=90, help='Spread posts over this many days.')
+        parser.add_argument('--prefix', default='user', help='Username prefix.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = generate(
+                users=options['users'],
+                posts_per_user=options['posts_per_user'],
+                follows_per_user=options['follows_per_user'],
+                likes_per_post=options['likes_per_post'],
+                comments_per_post=options['comments_per_post'],
+                tags=options['tags'],
+                days=options['days'],
+                prefix=options['prefix'],
+                seed=options['seed'],
+                log=lambda message: self.stdout.write(f'  {message}'),
+            )
+        summary = ', '.join(f'{count} {name}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}.'))
+        self.stdout.write(f'Every generated user has the password "{PASSWORD}".')
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Copy the SQLite primary database into the SQLite replica files, once or every --interval '
+            'seconds. A local stand-in for replication, to try the replica router.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep copying every this many seconds (simulated replication lag).')
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas configured; set DB_REPLICAS.')
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Server databases replicate themselves; this command only copies SQLite files.')
+
+        while True:
+            start = time.perf_counter()
+            source = sqlite3.connect(primary['NAME'])
+            try:
+                for alias in settings.REPLICA_DATABASES:
+                    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(f'Copied to {len(settings.REPLICA_DATABASES)} replica(s) '
+                              f'in {(time.perf_counter() - start) * 1000:.0f} ms.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
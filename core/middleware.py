@@ -0,0 +1,100 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .queries import QueryRecorder
+from .replicas import PIN_COOKIE, SAFE_METHODS, request_scope
+
+logger = logging.getLogger('core.queries')
+
+
+class QueryInspectorMiddleware:
+    """Record the SQL run by each request and warn about repeated query shapes.
+
+    Enabled by ``QUERY_INSPECTOR`` (on by default when ``DEBUG`` is). Every
+    response gets ``X-Query-Count`` and ``X-Query-Time-Ms`` headers; requests
+    that run the same query shape from the same code at least
+    ``QUERY_INSPECTOR_REPEAT_THRESHOLD`` times are logged to ``core.queries``
+    with the normalized SQL and calling stack.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.process(request, response, recorder)
+
+    async def __acall__(self, request):
+        # Async views run their queries on the request's thread-sensitive
+        # worker thread, whose connections are the ones to instrument
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.process(request, response, recorder)
+
+    def process(self, request, response, recorder):
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time-Ms'] = f'{recorder.duration * 1000:.1f}'
+        repeated = recorder.repeated()
+        if repeated:
+            response['X-Query-Repeated'] = str(len(repeated))
+            logger.warning('Possible N+1 queries in %s %s\n%s',
+                           request.method, request.path, recorder.report())
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Keep users who just wrote on the primary database (see ``core.replicas``).
+
+    Enabled when ``REPLICA_DATABASES`` is set. Unsafe methods and requests
+    carrying the pin cookie read from the primary; requests that wrote set
+    the cookie for ``REPLICA_PIN_SECONDS``.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        unsafe = request.method not in SAFE_METHODS
+        with request_scope(pinned=unsafe or PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self.process(request, response, unsafe, state)
+
+    async def __acall__(self, request):
+        # The routing state is a context variable, which sync_to_async copies
+        # into the threads running the ORM
+        unsafe = request.method not in SAFE_METHODS
+        with request_scope(pinned=unsafe or PIN_COOKIE in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self.process(request, response, unsafe, state)
+
+    def process(self, request, response, unsafe, state):
+        if unsafe or state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,54 @@
+"""Pagination without COUNT(*) over huge tables.
+
+``EstimatedCountPaginator`` counts an unfiltered queryset from the
+database's own bookkeeping instead of scanning it: ``pg_class.reltuples`` on
+PostgreSQL, ``information_schema.tables`` on MySQL and the largest primary
+key on SQLite (one index lookup; deleted rows make it an overestimate, so
+the last pages may come up short). Tables estimated below
+``ADMIN_EXACT_COUNT_LIMIT`` rows, and filtered querysets, which the admin's
+indexed filters keep small, are counted exactly.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """Approximate row count of an unfiltered queryset, or None if unknown."""
+    query = queryset.query
+    if query.where or query.distinct or query.is_sliced or query.combinator:
+        return None
+    meta = queryset.model._meta
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [meta.db_table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [meta.db_table],
+            )
+        elif isinstance(meta.pk, models.AutoField):
+            quote = connection.ops.quote_name
+            cursor.execute(f'SELECT MAX({quote(meta.pk.column)}) FROM {quote(meta.db_table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analysed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the count of large unfiltered querysets."""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
@@ -0,0 +1,156 @@
+"""Query plan checks for the app's hot querysets.
+
+Apps list the querysets behind their busiest pages in a ``hot_queries``
+module, each a function decorated with ``@hot_query`` that takes a sample
+viewer and returns an unevaluated queryset. ``check_plans`` runs EXPLAIN on
+every one of them and reports:
+
+* full table scans (SQLite ``SCAN <table>`` without an index, PostgreSQL
+  ``Seq Scan`` with sequential scans disabled for the session, so it only
+  remains where no index can be used), and
+* sorts that need every matching row first (SQLite ``USE TEMP B-TREE FOR
+  ORDER BY``, PostgreSQL ``Sort``).
+
+For each problem it suggests an index on the table's filtered columns
+followed by its ordering. ``manage.py explain_queries`` and
+``core.testing.QueryPlanMixin`` fail on any problem, so index regressions
+are caught in CI.
+"""
+import json
+from dataclasses import dataclass, field
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.expressions import Col
+from django.utils.module_loading import autodiscover_modules
+
+HOT_QUERIES = {}
+
+
+def hot_query(name=None, allow=(), allow_sort=False):
+    """Register a queryset factory.
+
+    ``allow`` lists tables the query may scan; ``allow_sort`` accepts a sort
+    of the matching rows, for queries whose matches are few by design.
+    """
+    def register(function):
+        HOT_QUERIES[name or function.__name__] = (function, frozenset(allow), allow_sort)
+        return function
+    return register
+
+
+def autodiscover():
+    autodiscover_modules('hot_queries')
+
+
+@dataclass
+class Plan:
+    name: str
+    sql: str
+    params: tuple
+    lines: list
+    problems: list = field(default_factory=list)
+    suggestion: str = ''
+
+
+def _filter_columns(query):
+    """Columns of the base table compared in the WHERE clause, equality first."""
+    equal, other = [], []
+
+    def walk(node):
+        for child in node.children:
+            if hasattr(child, 'children'):
+                walk(child)
+                continue
+            lhs = getattr(child, 'lhs', None)
+            if isinstance(lhs, Col) and lhs.alias == query.base_table:
+                target = equal if child.lookup_name in ('exact', 'in', 'isnull') else other
+                if lhs.target.name not in target:
+                    target.append(lhs.target.name)
+
+    walk(query.where)
+    return equal + [name for name in other if name not in equal]
+
+
+def _order_columns(query):
+    names = []
+    for item in query.order_by:
+        if isinstance(item, str):
+            names.append(item)
+        elif isinstance(getattr(item, 'expression', None), F):
+            names.append(('-' if item.descending else '') + item.expression.name)
+    return names
+
+
+def _suggest(queryset):
+    fields = _filter_columns(queryset.query)
+    for name in _order_columns(queryset.query):
+        if name.lstrip('-') not in fields:
+            fields.append(name)
+    if not fields:
+        return ''
+    label = queryset.model._meta.label
+    return f'consider models.Index(fields={fields!r}) on {label}'
+
+
+def _sqlite_plan(cursor, sql, params, allow, allow_sort):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    lines, problems = [], []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        lines.append(detail)
+        words = detail.split()
+        if words[:1] == ['SCAN'] and 'USING' not in words and words[1] not in allow:
+            problems.append(f'full scan of {words[1]}')
+        if detail.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detail and not allow_sort:
+            problems.append('sorts all matching rows')
+    return lines, problems
+
+
+def _postgres_plan(cursor, sql, params, allow, allow_sort):
+    cursor.execute('SET LOCAL enable_seqscan = off')
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, problems = [], []
+
+    def walk(node, depth):
+        relation = node.get('Relation Name')
+        lines.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+        if node['Node Type'] == 'Seq Scan' and relation not in allow:
+            problems.append(f'full scan of {relation}')
+        if node['Node Type'] == 'Sort' and not allow_sort:
+            problems.append('sorts all matching rows')
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(plan[0]['Plan'], 0)
+    return lines, problems
+
+
+def explain(name, queryset, allow=frozenset(), allow_sort=False):
+    """The ``Plan`` of ``queryset`` on its database."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with transaction.atomic(using=connection.alias):
+                lines, problems = _postgres_plan(cursor, sql, params, allow, allow_sort)
+        else:
+            lines, problems = _sqlite_plan(cursor, sql, params, allow, allow_sort)
+    plan = Plan(name, sql, tuple(params), lines, problems)
+    if problems:
+        plan.suggestion = _suggest(queryset)
+    return plan
+
+
+def check_plans(viewer, names=None):
+    """Plans of the registered hot queries (all, or those in ``names``)."""
+    autodiscover()
+    plans = []
+    for name, (factory, allow, allow_sort) in sorted(HOT_QUERIES.items()):
+        if names and name not in names:
+            continue
+        plans.append(explain(name, factory(viewer), allow, allow_sort))
+    return plans
@@ -0,0 +1,127 @@
+"""SQL recording and N+1 detection.
+
+``QueryRecorder`` installs an execute wrapper on every database connection
+and records each query with its duration and the project code that issued
+it. Queries are grouped by *shape*: the SQL with literals and ``IN`` lists
+collapsed, plus the calling stack. The same shape run several times from the
+same place within one request is almost always an N+1 (a query per row of
+something that was already loaded), which ``repeated()`` reports.
+
+Used by ``core.middleware.QueryInspectorMiddleware`` for every request and by
+the query-budget assertions in ``core.testing``.
+"""
+import os
+import re
+import time
+import traceback
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+# Frames from these paths are not "project code" for the calling stack
+_IGNORED = ('site-packages', 'dist-packages', f'{os.sep}django{os.sep}') + tuple(
+    os.path.join(os.path.dirname(__file__), name) for name in ('queries.py', 'middleware.py', 'testing.py')
+)
+
+STACK_DEPTH = 4
+
+
+def normalize(sql):
+    """Collapse literals and parameter lists so equivalent queries compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _project_stack():
+    """The innermost project frames of the current stack, outermost first."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        f'{frame.filename[len(base) + 1:]}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and not any(part in frame.filename for part in _IGNORED)
+    ]
+    return tuple(frames[-STACK_DEPTH:])
+
+
+@dataclass
+class QueryGroup:
+    sql: str
+    stack: tuple
+    count: int = 0
+    duration: float = 0.0
+
+
+class QueryRecorder:
+    """Context manager recording the queries run on all connections."""
+
+    def __init__(self, capture_stacks=True):
+        self.capture_stacks = capture_stacks
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration': time.perf_counter() - start,
+                'stack': _project_stack() if self.capture_stacks else (),
+                'alias': context['connection'].alias,
+            })
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Total SQL time in seconds."""
+        return sum(query['duration'] for query in self.queries)
+
+    def groups(self):
+        """Queries grouped by normalized SQL and calling stack, most frequent first."""
+        groups = {}
+        for query in self.queries:
+            key = (normalize(query['sql']), query['stack'])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = QueryGroup(sql=key[0], stack=key[1])
+            group.count += 1
+            group.duration += query['duration']
+        return sorted(groups.values(), key=lambda group: (-group.count, -group.duration))
+
+    def repeated(self, threshold=None):
+        """Groups run at least ``threshold`` times: likely N+1 queries."""
+        if threshold is None:
+            threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+        return [group for group in self.groups() if group.count >= threshold]
+
+    def report(self, threshold=None):
+        """A plain-text summary suitable for logs and assertion messages."""
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f} ms']
+        for group in self.repeated(threshold):
+            lines.append(f'  {group.count}x ({group.duration * 1000:.1f} ms) {group.sql}')
+            lines.extend(f'      at {frame}' for frame in reversed(group.stack))
+        return '\n'.join(lines)
+
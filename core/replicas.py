@@ -0,0 +1,89 @@
+"""Read replicas with read-your-writes stickiness.
+
+``ReplicaRouter`` sends every write to the primary (``default``). Reads go
+to the primary too, except inside views decorated with ``read_from_replica``
+(the heavy read paths), which pick one of the ``REPLICA_DATABASES`` aliases
+for the whole request.
+
+``core.middleware.ReplicaPinningMiddleware`` keeps users on the primary
+after they write: a request that is not GET/HEAD/OPTIONS, or that writes
+through the ORM, sets a cookie for ``REPLICA_PIN_SECONDS``, and requests
+carrying that cookie read from the primary, so people see their own likes,
+comments, posts and follows even while replicas lag behind. Once a request
+has written, its remaining reads also use the primary.
+
+Without replicas configured the router sends everything to ``default`` and
+the middleware removes itself.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Always read from the primary: a session missing from a lagging replica
+# would log its user out
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+@dataclass
+class _RequestState:
+    pinned: bool = False
+    wrote: bool = False
+    replica: str = None
+
+
+_state = ContextVar('replica_state', default=None)
+
+
+@contextmanager
+def request_scope(pinned):
+    """Route the enclosed request's queries; yields its state (``.wrote``)."""
+    state = _RequestState(pinned=pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned or state.wrote or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def read_from_replica(view):
+    """Serve the view's reads from a replica unless the request is pinned."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is not None and not state.pinned and settings.REPLICA_DATABASES:
+            state.replica = random.choice(settings.REPLICA_DATABASES)
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .images import IMAGE_FIELDS, instance_names, stored_names
+from .storage import adjust_references
+
+
+def _connect(model, field_name):
+    variants_field = f'{field_name}_variants'
+
+    def remember_stored_names(sender, instance, **kwargs):
+        instance._stored_names = set()
+        if instance.pk is None:
+            return
+        row = sender.objects.filter(pk=instance.pk).values(field_name, variants_field).first()
+        if row:
+            instance._stored_names = stored_names(row[field_name], row[variants_field])
+            if getattr(instance, field_name).name != row[field_name]:
+                # A new (or removed) file: the old picture's derivatives go in
+                # the same save, and process_images sees the field as pending.
+                setattr(instance, variants_field, {})
+                setattr(instance, f'{field_name}_width', None)
+                setattr(instance, f'{field_name}_height', None)
+
+    def update_references(sender, instance, **kwargs):
+        adjust_references(getattr(instance, '_stored_names', set()), instance_names(instance, field_name))
+
+    def release_references(sender, instance, **kwargs):
+        adjust_references(instance_names(instance, field_name), set())
+
+    uid = f'media-refs-{model._meta.label_lower}-{field_name}'
+    pre_save.connect(remember_stored_names, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(update_references, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(release_references, sender=model, weak=False, dispatch_uid=uid)
+
+
+def connect_media_references():
+    """Keep MediaBlob reference counts in step with every registered image field."""
+    for label, field_name in IMAGE_FIELDS:
+        _connect(apps.get_model(label), field_name)
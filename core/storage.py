@@ -0,0 +1,105 @@
+"""Content-addressed media storage.
+
+Uploads are hashed (SHA-256) while they are streamed to a temporary file and
+then stored once under ``blobs/<aa>/<bb>/<digest><ext>``; saving identical
+content again returns the existing name instead of writing a renamed copy.
+Each blob has a ``core.MediaBlob`` row whose ``ref_count`` tracks how many
+image fields (originals and variants, see ``core.images.IMAGE_FIELDS``)
+point at it. ``delete()`` never removes a blob directly because other rows
+may share it; ``manage.py gc_media`` recounts references and removes blobs
+that nothing uses any more.
+
+Saving refreshes the blob row's ``last_seen_at`` before the file is checked
+or written, and garbage collection deletes the row with one conditional
+DELETE and removes the file before committing. A save racing with the
+collector therefore either keeps the blob young enough to survive, or waits
+for the collection to commit and then writes the file afresh.
+
+Files saved before this backend was enabled keep their old names and are
+served and deleted as usual.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_ROOT = 'blobs'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_ROOT + '/')
+
+
+def blob_name(digest, ext):
+    return posixpath.join(BLOB_ROOT, digest[:2], digest[2:4], digest + ext)
+
+
+def adjust_references(before, after):
+    """Move reference counts from the blob names in ``before`` to those in ``after``.
+
+    Both are collections of storage names; a name in both is left alone and
+    names that are not blobs are ignored.
+    """
+    from .models import MediaBlob
+
+    before = {name for name in before if is_blob(name)}
+    after = {name for name in after if is_blob(name)}
+    released, retained = before - after, after - before
+    if released:
+        MediaBlob.objects.filter(name__in=released).update(ref_count=F('ref_count') - 1)
+    if retained:
+        MediaBlob.objects.filter(name__in=retained).update(ref_count=F('ref_count') + 1)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name is the content hash chosen in _save(); never rename.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        ext = os.path.splitext(name)[1].lower()
+        digest = hashlib.sha256()
+        size = 0
+        os.makedirs(self.location, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.location, prefix='.upload-', delete=False) as tmp:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        name = blob_name(digest.hexdigest(), ext)
+        with transaction.atomic():
+            seen = MediaBlob.objects.filter(name=name).update(last_seen_at=timezone.now())
+            if not seen:
+                MediaBlob.objects.get_or_create(
+                    name=name, defaults={'sha256': digest.hexdigest(), 'size': size}
+                )
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(tmp.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp.name, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def delete(self, name):
+        # Blobs may be shared; unreferenced ones are removed by gc_media.
+        if is_blob(name):
+            return
+        super().delete(name)
+
+    def delete_blob(self, name):
+        """Physically remove a blob file (used by garbage collection)."""
+        super().delete(name)
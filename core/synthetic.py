@@ -0,0 +1,230 @@
+"""Synthetic data for local benchmarks and load tests.
+
+``generate()`` bulk-inserts users (with Profile and Settings), a follow
+graph, posts with categories, tags and shares, likes, comments, blocks and
+reports, then rebuilds what bulk inserts skip: engagement counters, tag
+usage counts, home timelines and the search index. Popularity is Zipf-distributed and activity
+per user is Pareto-distributed, so a few accounts hold most of the followers
+and a few posts most of the engagement, as in production.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+
+from posts.counters import reconcile_counters
+from posts.models import Block, Category, Comment, Like, Post, Report, Tag
+from posts.search import rebuild_index
+from posts.tags import reconcile_usage_counts
+from posts.timeline import rebuild_timeline
+from users.models import Follow, Profile, Settings
+
+User = get_user_model()
+
+PASSWORD = 'password'
+BATCH_SIZE = 1000
+
+WORDS = (
+    'art', 'bike', 'book', 'city', 'code', 'coffee', 'cook', 'dance', 'django',
+    'dog', 'film', 'food', 'friends', 'game', 'garden', 'hike', 'home', 'idea',
+    'jazz', 'lake', 'learn', 'life', 'light', 'love', 'market', 'morning',
+    'movie', 'music', 'night', 'ocean', 'paint', 'park', 'photo', 'python',
+    'rain', 'read', 'river', 'road', 'run', 'science', 'sea', 'snow', 'song',
+    'space', 'sport', 'spring', 'street', 'summer', 'sun', 'tea', 'tech',
+    'train', 'travel', 'tree', 'trip', 'walk', 'weekend', 'winter', 'work',
+    'write',
+)
+CATEGORY_NAMES = ('News', 'Sports', 'Technology', 'Music', 'Travel', 'Food', 'Art', 'Science')
+PRIVACY_WEIGHTS = (('public', 70), ('friends', 20), ('private', 10))
+FREQUENCY_WEIGHTS = (('immediate', 80), ('daily', 15), ('weekly', 5))
+
+
+def _pareto_count(rng, mean, cap):
+    """A heavy-tailed non-negative count with roughly the given mean."""
+    # paretovariate(1.5) has mean 3
+    return min(cap, int(rng.paretovariate(1.5) * mean / 3))
+
+
+def _zipf_cum_weights(n, exponent=1.0):
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _sentence(rng, low=5, high=25):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + '.'
+
+
+def _pick_distinct(rng, population, cum_weights, k, exclude=None):
+    """Up to ``k`` distinct weighted picks from ``population``."""
+    picked = set()
+    attempts = 0
+    while len(picked) < k and attempts < k * 4:
+        batch = rng.choices(population, cum_weights=cum_weights, k=k - len(picked))
+        picked.update(value for value in batch if value != exclude)
+        attempts += len(batch)
+    return picked
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """Let bulk_create keep the ``timestamp`` values we set instead of now()."""
+    fields = [model._meta.get_field('timestamp') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _bulk(model, rows):
+    model.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _created_after(model, last_pk):
+    return model.objects.filter(pk__gt=last_pk or 0).order_by('pk')
+
+
+def generate(users=1000, posts_per_user=10, follows_per_user=30, likes_per_post=5,
+             comments_per_post=2, tags=200, days=90, prefix='user', seed=0, log=None):
+    """Insert a synthetic data set and return {model name: rows created}."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+
+    # Users, profiles and settings
+    last_user = User.objects.aggregate(last=Max('pk'))['last']
+    offset = User.objects.filter(username__startswith=prefix).count()
+    password = make_password(PASSWORD)
+    _bulk(User, [
+        User(username=f'{prefix}{offset + i}', email=f'{prefix}{offset + i}@example.com',
+             password=password, date_joined=start)
+        for i in range(users)
+    ])
+    user_ids = list(_created_after(User, last_user).values_list('pk', flat=True))
+    _bulk(Profile, [Profile(user_id=user_id, bio=_sentence(rng, 3, 12)) for user_id in user_ids])
+    _bulk(Settings, [
+        Settings(user_id=user_id, privacy=_weighted(rng, PRIVACY_WEIGHTS),
+                 email_frequency=_weighted(rng, FREQUENCY_WEIGHTS))
+        for user_id in user_ids
+    ])
+    log(f'{len(user_ids)} users')
+
+    # Follow graph: follower counts follow a Zipf distribution over a random ranking
+    popularity = rng.sample(user_ids, len(user_ids))
+    popularity_weights = _zipf_cum_weights(len(popularity))
+    follows = []
+    for user_id in user_ids:
+        count = _pareto_count(rng, follows_per_user, len(user_ids) - 1)
+        for target in _pick_distinct(rng, popularity, popularity_weights, count, exclude=user_id):
+            follows.append(Follow(follower_id=user_id, following_id=target))
+        if len(follows) >= BATCH_SIZE * 10:
+            _bulk(Follow, follows)
+            follows = []
+    _bulk(Follow, follows)
+    log('follow graph')
+
+    # Categories and tags
+    for name in CATEGORY_NAMES:
+        Category.objects.get_or_create(name=name)
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    tag_names = [f'{WORDS[i % len(WORDS)]}{i // len(WORDS) or ""}' for i in range(tags)]
+    _bulk(Tag, [Tag(name=name) for name in tag_names])
+    tag_ids = list(Tag.objects.filter(name__in=tag_names).values_list('pk', flat=True))
+    tag_weights = _zipf_cum_weights(len(tag_ids))
+
+    # Posts, then shares of earlier posts
+    last_post = Post.objects.aggregate(last=Max('pk'))['last']
+    span = (now - start).total_seconds()
+    posts = []
+    for user_id in user_ids:
+        for _ in range(_pareto_count(rng, posts_per_user, posts_per_user * 50)):
+            posts.append(Post(
+                user_id=user_id, text=_sentence(rng),
+                timestamp=start + timedelta(seconds=rng.uniform(0, span)),
+                category_id=rng.choice(category_ids) if rng.random() < 0.7 else None,
+            ))
+    with _explicit_timestamps(Post, Comment):
+        _bulk(Post, posts)
+        originals = list(_created_after(Post, last_post).values_list('pk', 'timestamp'))
+        original_weights = _zipf_cum_weights(len(originals))
+        ranked_originals = rng.sample(originals, len(originals))
+        shares = []
+        for _ in range(len(originals) // 20):
+            shared_id, shared_at = rng.choices(ranked_originals, cum_weights=original_weights)[0]
+            shares.append(Post(
+                user_id=rng.choice(user_ids), text=_sentence(rng, 1, 8), shared_from_id=shared_id,
+                is_shared=True, timestamp=shared_at + (now - shared_at) * rng.random(),
+            ))
+        _bulk(Post, shares)
+        post_rows = list(_created_after(Post, last_post).values_list('pk', 'timestamp'))
+        log(f'{len(post_rows)} posts')
+
+        through = Post.tags.through
+        _bulk(through, [
+            through(post_id=post_id, tag_id=tag_id)
+            for post_id, _ in post_rows
+            for tag_id in _pick_distinct(rng, tag_ids, tag_weights, rng.randint(0, 3))
+        ])
+
+        # Engagement is concentrated on a few posts
+        likes, comments = [], []
+        for post_id, posted_at in post_rows:
+            for liker in rng.sample(user_ids, _pareto_count(rng, likes_per_post, len(user_ids))):
+                likes.append(Like(post_id=post_id, user_id=liker))
+            for _ in range(_pareto_count(rng, comments_per_post, 500)):
+                comments.append(Comment(
+                    post_id=post_id, user_id=rng.choice(user_ids), text=_sentence(rng, 2, 15),
+                    timestamp=posted_at + (now - posted_at) * rng.random(),
+                ))
+            if len(likes) + len(comments) >= BATCH_SIZE * 10:
+                _bulk(Like, likes)
+                _bulk(Comment, comments)
+                likes, comments = [], []
+        _bulk(Like, likes)
+        _bulk(Comment, comments)
+    log('likes and comments')
+
+    # A little abuse handling
+    _bulk(Block, [
+        Block(blocker_id=user_id, blocked_user_id=blocked)
+        for user_id in rng.sample(user_ids, len(user_ids) // 100)
+        for blocked in _pick_distinct(rng, user_ids, None, rng.randint(1, 3), exclude=user_id)
+    ])
+    reasons = [choice for choice, _ in Report.REPORT_CHOICES]
+    reported = rng.sample(post_rows, len(post_rows) // 200)
+    authors = dict(Post.objects.filter(pk__in=[pk for pk, _ in reported]).values_list('pk', 'user_id'))
+    _bulk(Report, [
+        Report(reporter_id=rng.choice(user_ids), reported_user_id=authors[post_id], post_id=post_id,
+               reason=rng.choice(reasons), is_resolved=rng.random() < 0.5)
+        for post_id, _ in reported
+    ])
+
+    # Derived data that bulk_create bypasses
+    reconcile_counters()
+    reconcile_usage_counts()
+    for user in _created_after(User, last_user).iterator():
+        rebuild_timeline(user)
+    rebuild_index(_created_after(Post, last_post))
+    log('counters, timelines and search index')
+
+    return {
+        'users': len(user_ids),
+        'follows': Follow.objects.filter(follower_id__gt=last_user or 0).count(),
+        'posts': len(post_rows),
+        'likes': Like.objects.filter(post_id__gt=last_post or 0).count(),
+        'comments': Comment.objects.filter(post_id__gt=last_post or 0).count(),
+        'blocks': Block.objects.filter(blocker_id__gt=last_user or 0).count(),
+        'reports': len(reported),
+    }
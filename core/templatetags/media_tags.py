@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, sizes='100vw', **attrs):
+    """Render an uploaded image as <picture> with WebP and fallback srcsets.
+
+    ``variants`` is the ``<field>_variants`` dict written by
+    ``core.images``; until an image has been processed the original is
+    rendered as a plain <img>. Extra keyword arguments become attributes on
+    the <img> (e.g. class, style, alt).
+    """
+    if not field_file:
+        return ''
+    extra = format_html_join(' ', '{}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
+    if not variants:
+        return format_html('<img src="{}" loading="lazy" {}>', field_file.url, extra)
+
+    storage = field_file.storage
+    widths = sorted(variants, key=int)
+    largest = variants[widths[-1]]
+
+    def srcset(kind):
+        return ', '.join(f'{storage.url(variants[w][kind])} {w}w' for w in widths)
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" loading="lazy" decoding="async" {}>'
+        '</picture>',
+        srcset('webp'), sizes,
+        storage.url(largest['fallback']), srcset('fallback'), sizes,
+        widths[-1], largest['height'], extra,
+    )
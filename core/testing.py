@@ -0,0 +1,64 @@
+"""Query-budget and query-plan assertions for view tests.
+
+    class FeedTests(QueryBudgetMixin, TestCase):
+        def test_feed_queries(self):
+            with self.assertQueryBudget(8):
+                self.client.get(reverse('posts:home_feed'))
+
+The block fails when it runs more than ``budget`` queries or, unless
+``allow_repeated`` is set, when any query shape repeats often enough to look
+like an N+1; the failure message lists the offending SQL and call sites.
+
+``QueryPlanMixin.assertHotQueriesIndexed`` fails when any registered hot
+query (see ``core.plans``) scans a table or sorts all matching rows.
+
+``make_user`` creates a user with the profile and settings rows the views
+expect.
+"""
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+
+from users.models import Profile, Settings
+from .plans import check_plans
+from .queries import QueryRecorder
+
+
+def make_user(username, privacy='public'):
+    user = User.objects.create_user(username, f'{username}@example.com', 'password')
+    Profile.objects.create(user=user)
+    Settings.objects.create(user=user, privacy=privacy)
+    return user
+
+
+@contextmanager
+def query_budget(budget, allow_repeated=False, threshold=None):
+    """Raise AssertionError if the block exceeds ``budget`` queries or repeats a query shape."""
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = []
+    if recorder.count > budget:
+        problems.append(f'{recorder.count} queries exceeds the budget of {budget}')
+    if not allow_repeated and recorder.repeated(threshold):
+        problems.append('repeated query shapes (likely N+1)')
+    if problems:
+        raise AssertionError('; '.join(problems) + '\n' + recorder.report(threshold))
+
+
+class QueryBudgetMixin:
+    """TestCase mixin providing ``assertQueryBudget``."""
+
+    def assertQueryBudget(self, budget, allow_repeated=False, threshold=None):
+        return query_budget(budget, allow_repeated=allow_repeated, threshold=threshold)
+
+
+class QueryPlanMixin:
+    """TestCase mixin providing ``assertHotQueriesIndexed``."""
+
+    def assertHotQueriesIndexed(self, viewer, names=None):
+        failing = [plan for plan in check_plans(viewer, names) if plan.problems]
+        if failing:
+            raise AssertionError('\n\n'.join(
+                f'{plan.name}: {"; ".join(plan.problems)}\n  {plan.suggestion}\n  ' + '\n  '.join(plan.lines)
+                for plan in failing
+            ))
@@ -1,3 +1,142 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.management import call_command
+from django.db import connections, router
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.middleware import ReplicaPinningMiddleware
+from core.models import MediaBlob
+from core.replicas import PIN_COOKIE, read_from_replica
+from core.testing import QueryPlanMixin, make_user
+from posts.models import Post
+
+
+class HotQueryPlanTests(QueryPlanMixin, TestCase):
+    """The registered hot queries (core.plans) stay on their indexes."""
+
+    def test_hot_queries_indexed(self):
+        self.assertHotQueriesIndexed(make_user('viewer'))
+
+
+class GcMediaTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = storages['default']
+
+    def gc(self):
+        call_command('gc_media', stdout=StringIO())
+
+    def test_old_orphans_are_deleted(self):
+        name = self.storage.save('a.txt', ContentFile(b'old'))
+        MediaBlob.objects.update(last_seen_at=timezone.now() - timedelta(days=2))
+        self.gc()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_saving_again_restarts_the_grace_period(self):
+        name = self.storage.save('a.txt', ContentFile(b'old'))
+        MediaBlob.objects.update(last_seen_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.storage.save('b.txt', ContentFile(b'old')), name)
+        self.gc()
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+        self.assertTrue(self.storage.exists(name))
+
+    def test_recount_repairs_counts(self):
+        name = self.storage.save('a.txt', ContentFile(b'data'))
+        MediaBlob.objects.update(ref_count=3)
+        self.gc()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 0)
+
+
+def routing_view(request):
+    """Report where the request's reads and writes are routed, without querying."""
+    routes = {
+        'posts': router.db_for_read(Post),
+        'sessions': router.db_for_read(Session),
+        'user_write': router.db_for_write(User),
+    }
+    # The write above pins the rest of the request to the primary
+    routes['posts_after_write'] = router.db_for_read(Post)
+    return JsonResponse(routes)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """``ReplicaRouter`` decisions as seen from inside a request."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def route(self, request, view=read_from_replica(routing_view)):
+        response = ReplicaPinningMiddleware(view)(request)
+        return json.loads(response.content), response.cookies
+
+    def test_replica_view_reads_from_replica(self):
+        routes, cookies = self.route(self.factory.get('/'))
+        self.assertEqual(routes['posts'], 'replica1')
+        self.assertEqual(routes['posts_after_write'], 'default')
+        # The routed write pinned the user for the next requests
+        self.assertIn(PIN_COOKIE, cookies)
+
+    def test_other_views_read_from_primary(self):
+        routes, _ = self.route(self.factory.get('/'), view=routing_view)
+        self.assertEqual(routes['posts'], 'default')
+
+    def test_unsafe_methods_read_from_primary(self):
+        routes, cookies = self.route(self.factory.post('/'))
+        self.assertEqual(routes['posts'], 'default')
+        self.assertIn(PIN_COOKIE, cookies)
+
+    def test_pin_cookie_reads_from_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        routes, _ = self.route(request)
+        self.assertEqual(routes['posts'], 'default')
+
+    def test_sessions_and_auth_writes_use_primary(self):
+        routes, _ = self.route(self.factory.get('/'))
+        self.assertEqual(routes['sessions'], 'default')
+        self.assertEqual(routes['user_write'], 'default')
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'set DB_REPLICAS to run against a replica alias')
+class ReplicaReadTests(TransactionTestCase):
+    """End to end with ``DB_REPLICAS`` set. The test replica mirrors the test
+    primary over its own connection, so the data has to be committed."""
+
+    databases = '__all__'
+
+    def test_feed_reads_from_replica_until_the_user_writes(self):
+        replica = connections[settings.REPLICA_DATABASES[0]]
+        user = make_user('reader')
+        post = Post.objects.create(user=user, text='Hello')
+        self.client.force_login(user)
+        with CaptureQueriesContext(replica) as replica_queries:
+            self.client.get(reverse('posts:home_feed'))
+        self.assertTrue(any('posts_post' in query['sql'] for query in replica_queries))
+        self.assertFalse(any('django_session' in query['sql'] for query in replica_queries))
+
+        self.client.post(reverse('posts:set_like', args=[post.pk]))
+        with CaptureQueriesContext(replica) as replica_queries:
+            self.client.get(reverse('posts:home_feed'))
+        self.assertEqual(replica_queries.captured_queries, [])
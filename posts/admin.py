@@ -1,12 +1,91 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+
+from core.admin import LargeTableAdmin
 from .models import Post, Comment, Like, Category, Tag, Report, Block
+from .search import search_posts
+
+
+@admin.register(Post)
+class PostAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'timestamp', 'category', 'like_count', 'comment_count', 'share_count')
+    list_select_related = ('user', 'category')
+    list_filter = ('category',)
+    search_fields = ('text',)
+    autocomplete_fields = ('user', 'tags')
+    raw_id_fields = ('shared_from',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index rather than LIKE over every post
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term)[0], False
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'post', 'timestamp')
+    list_select_related = ('user', 'post__user')
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('post',)
+
+
+@admin.register(Like)
+class LikeAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'post')
+    list_select_related = ('user', 'post__user')
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('post',)
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(Tag)
+class TagAdmin(LargeTableAdmin):
+    list_display = ('name', 'usage_count')
+    search_fields = ('^name',)
+    ordering = ('name',)
+
+
+@admin.register(Report)
+class ReportAdmin(LargeTableAdmin):
+    list_display = ('id', 'reporter', 'reported_user', 'reason', 'timestamp', 'is_resolved')
+    list_select_related = ('reporter', 'reported_user')
+    # Unresolved reports are served by the partial posts_report_open index,
+    # the unfiltered and resolved lists by posts_report_ts
+    list_filter = ('is_resolved',)
+    ordering = ('-timestamp', '-id')
+    search_fields = ('=reported_user__username',)
+    autocomplete_fields = ('reporter', 'reported_user')
+    raw_id_fields = ('post',)
+    actions = ('resolve_reports', 'block_reported_users')
+
+    @admin.action(description='Mark selected reports as resolved')
+    def resolve_reports(self, request, queryset):
+        resolved = queryset.filter(is_resolved=False).update(is_resolved=True)
+        self.message_user(request, f'{resolved} report(s) resolved.', messages.SUCCESS)
+
+    @admin.action(description='Block (deactivate) the reported users and resolve')
+    def block_reported_users(self, request, queryset):
+        blocked = (
+            User.objects.filter(pk__in=queryset.values('reported_user'), is_active=True)
+            .update(is_active=False)
+        )
+        resolved = queryset.filter(is_resolved=False).update(is_resolved=True)
+        self.message_user(
+            request, f'{blocked} user(s) blocked, {resolved} report(s) resolved.', messages.SUCCESS
+        )
 
-# Register your models here.
 
-admin.site.register(Post)
-admin.site.register(Comment)
-admin.site.register(Like)
-admin.site.register(Category)
-admin.site.register(Tag)
-admin.site.register(Report)
-admin.site.register(Block)
+@admin.register(Block)
+class BlockAdmin(LargeTableAdmin):
+    list_display = ('id', 'blocker', 'blocked_user', 'timestamp')
+    list_select_related = ('blocker', 'blocked_user')
+    search_fields = ('=blocker__username',)
+    autocomplete_fields = ('blocker', 'blocked_user')
@@ -0,0 +1,57 @@
+"""Denormalized engagement counters on ``Post``.
+
+``like_count``, ``comment_count`` and ``share_count`` are adjusted with
+atomic F() updates in the same transaction that creates or deletes the
+underlying row, and ``reconcile_counters`` recomputes them from the source
+tables to repair any drift (admin edits, cascades).
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Like, Post
+
+# counter field -> (source model, FK on the source pointing at the post)
+COUNTERS = {
+    'like_count': (Like, 'post'),
+    'comment_count': (Comment, 'post'),
+    'share_count': (Post, 'shared_from'),
+}
+
+
+def adjust_counter(post_id, field, delta):
+    """Atomically add ``delta`` to one counter of one post, never going below 0.
+
+    Call it in the same transaction as the row write it counts.
+    """
+    Post.objects.filter(pk=post_id).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_count(field):
+    """Expression computing the true value of a counter for each post."""
+    model, fk = COUNTERS[field]
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_counters(fields=None, dry_run=False):
+    """Repair drifted counters; return {field: number of posts fixed}."""
+    fixed = {}
+    for field in fields or COUNTERS:
+        drifted = (
+            Post.objects.annotate(actual=actual_count(field))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', flat=True)
+        )
+        if dry_run:
+            fixed[field] = drifted.count()
+        else:
+            fixed[field] = Post.objects.filter(pk__in=drifted).update(
+                **{field: actual_count(field)}
+            )
+    return fixed
@@ -1,12 +1,18 @@
 from django import forms
 from .models import Post, Comment, Category, Tag
+from .tags import MAX_TAGS_PER_POST, parse_tags
 
 class PostForm(forms.ModelForm):
     tags = forms.CharField(
         max_length=200, 
         required=False, 
         help_text='Enter tags separated by commas',
-        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter tags separated by commas'})
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Enter tags separated by commas',
+            'list': 'tag-suggestions',
+            'autocomplete': 'off',
+        })
     )
     
     class Meta:
@@ -23,11 +29,10 @@ class PostForm(forms.ModelForm):
         }
     
     def clean_tags(self):
-        tags = self.cleaned_data.get('tags', '')
-        if tags:
-            tag_names = [tag.strip() for tag in tags.split(',') if tag.strip()]
-            return tag_names
-        return []
+        tag_names = parse_tags(self.cleaned_data.get('tags', ''))
+        if len(tag_names) > MAX_TAGS_PER_POST:
+            raise forms.ValidationError(f'Use at most {MAX_TAGS_PER_POST} tags.')
+        return tag_names
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,81 @@
+"""Querysets behind the busiest post pages, checked by ``manage.py explain_queries``."""
+from datetime import datetime, timezone
+
+from django.db.models import Exists, OuterRef, Q
+
+from core.plans import hot_query
+from .models import Comment, Like, Post, Report, Tag, TimelineEntry, TrendingScore
+
+PAGE = 21
+SAMPLE_ID = 1
+SAMPLE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _page(posts):
+    return posts.order_by('-timestamp', '-id')[:PAGE]
+
+
+def _after_cursor(posts):
+    return posts.filter(Q(timestamp__lt=SAMPLE_TIME) | Q(timestamp=SAMPLE_TIME, id__lt=SAMPLE_ID))
+
+
+@hot_query(allow={'users_settings'})
+def feed(viewer):
+    return _page(Post.objects.visible_to(viewer))
+
+
+@hot_query(allow={'users_settings'})
+def feed_next_page(viewer):
+    return _page(_after_cursor(Post.objects.visible_to(viewer)))
+
+
+@hot_query()
+def profile_posts(viewer):
+    return _page(Post.objects.filter(user_id=SAMPLE_ID).visible_to(viewer))
+
+
+# Reached through the tag's posts, which are then sorted: cost grows with the
+# number of posts under one tag, not with the table
+@hot_query(allow={'users_settings'}, allow_sort=True)
+def tag_feed(viewer):
+    return _page(Post.objects.visible_to(viewer).filter(tags__name='sample'))
+
+
+@hot_query()
+def following_timeline(viewer):
+    return TimelineEntry.objects.filter(user=viewer).order_by('-timestamp', '-post')[:PAGE]
+
+
+@hot_query()
+def post_comments(viewer):
+    return Comment.objects.filter(post_id=SAMPLE_ID).order_by('timestamp')
+
+
+@hot_query()
+def like_states(viewer):
+    liked = Exists(Like.objects.filter(post=OuterRef('pk'), user=viewer))
+    return (
+        Post.objects.visible_to(viewer).filter(pk__in=[1, 2, 3])
+        .annotate(liked=liked).values_list('pk', 'like_count', 'liked')
+    )
+
+
+@hot_query()
+def trending_posts(viewer):
+    return TrendingScore.objects.filter(kind='post').order_by('-score').values_list('object_id', flat=True)[:20]
+
+
+# Only the tags matching the typed prefix are sorted by usage
+@hot_query(allow_sort=True)
+def tag_autocomplete(viewer):
+    return Tag.objects.filter(name__gte='sa', name__lt='sa\U0010ffff').order_by('-usage_count', 'name')[:8]
+
+
+@hot_query()
+def open_reports(viewer):
+    return Report.objects.filter(is_resolved=False).order_by('-timestamp', '-id')[:50]
+
+
+@hot_query()
+def all_reports(viewer):
+    return Report.objects.order_by('-timestamp', '-id')[:100]
@@ -0,0 +1,111 @@
+"""Like state and idempotent like/unlike.
+
+``alike_states`` answers "which of these posts has the viewer liked, and how
+many likes do they have" for a whole page of posts in one query, leaving
+out posts the viewer may not see.
+``aset_like``/``aunset_like`` move a like to the requested state with a
+single conditional INSERT or DELETE; the counter, the author's notification
+and the trending score are only touched when a row actually changed, so
+repeated or concurrent clicks are harmless. The counter and notification are
+written in the like's own transaction.
+
+The like views are async; the raw INSERT/DELETE and the trending update have
+no async driver, so they run through ``sync_to_async``.
+"""
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Value
+
+from users.views import send_like_notification
+from . import trending
+from .counters import adjust_counter
+from .models import Like, Post
+
+# Upper bound on post ids accepted by one hydration request
+MAX_STATE_IDS = 100
+
+
+def _state_rows(viewer, post_ids):
+    if viewer.is_authenticated:
+        liked = Exists(Like.objects.filter(post=OuterRef('pk'), user=viewer))
+    else:
+        liked = Value(False)
+    return (
+        Post.objects.visible_to(viewer).filter(pk__in=post_ids)
+        .annotate(liked=liked).values_list('pk', 'like_count', 'liked')
+    )
+
+
+async def alike_states(viewer, post_ids):
+    """{post id: {'liked': bool, 'like_count': int}} for the posts among ``post_ids`` the viewer may see."""
+    # visible_to reads the viewer's block sets, which may query the database
+    rows = await sync_to_async(_state_rows)(viewer, post_ids)
+    return {pk: {'liked': bool(is_liked), 'like_count': count} async for pk, count, is_liked in rows}
+
+
+def _current(post_id):
+    return Post.objects.select_related('user').filter(pk=post_id).first()
+
+
+@transaction.atomic
+def _insert_like(user, post_id):
+    """Insert the like unless it exists (or the post does not), count it and
+    record the author's notification; return (post, whether a row was added)."""
+    if connection.vendor == 'mysql':
+        insert, source, conflict = 'INSERT IGNORE INTO', 'FROM DUAL ', ''
+    else:
+        insert, source, conflict = 'INSERT INTO', '', ' ON CONFLICT (post_id, user_id) DO NOTHING'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {Like._meta.db_table} (post_id, user_id) '
+            f'SELECT %s, %s {source}WHERE EXISTS (SELECT 1 FROM {Post._meta.db_table} WHERE id = %s)'
+            f'{conflict}',
+            [post_id, user.pk, post_id],
+        )
+        added = cursor.rowcount == 1
+    if added:
+        adjust_counter(post_id, 'like_count', 1)
+    post = _current(post_id)
+    if added and post is not None:
+        send_like_notification(post, user)
+    return post, added
+
+
+@transaction.atomic
+def _delete_like(user, post_id):
+    """Delete the like if present and uncount it; return (post, whether a row was removed)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Like._meta.db_table} WHERE post_id = %s AND user_id = %s',
+            [post_id, user.pk],
+        )
+        removed = cursor.rowcount == 1
+    if removed:
+        adjust_counter(post_id, 'like_count', -1)
+    return _current(post_id), removed
+
+
+async def aset_like(user, post_id):
+    """Make ``user`` like the post.
+
+    Returns (post with a fresh like_count, whether a like was added); the
+    post is None if it does not exist.
+    """
+    post, added = await sync_to_async(_insert_like)(user, post_id)
+    if added:
+        await sync_to_async(trending.record)(post_id, 'like')
+    return post, added
+
+
+async def aunset_like(user, post_id):
+    """Remove ``user``'s like from the post; returns (post, whether a like was removed)."""
+    return await sync_to_async(_delete_like)(user, post_id)
+
+
+async def atoggle_like(user, post_id):
+    """Flip ``user``'s like on the post; returns (post, whether it is now liked)."""
+    post, added = await aset_like(user, post_id)
+    if added:
+        return post, True
+    post, _ = await aunset_like(user, post_id)
+    return post, False
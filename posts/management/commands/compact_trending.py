@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import compact
+
+
+class Command(BaseCommand):
+    help = 'Drop decayed, surplus and orphaned trending scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, default=0.05,
+                            help='Delete scores that have decayed below this (one like = 1).')
+        parser.add_argument('--keep', type=int, default=1000,
+                            help='Scores kept per kind (posts, tags).')
+
+    def handle(self, *args, **options):
+        deleted = compact(min_score=options['min_score'], keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} trending score(s).'))
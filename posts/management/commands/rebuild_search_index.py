@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+from posts.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for posts.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError('No search index is available; searches use substring matching.')
+        count = rebuild_index(Post.objects.order_by('pk'))
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} post(s) with {backend}.'))
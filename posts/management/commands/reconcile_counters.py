@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import COUNTERS, reconcile_counters
+from posts.tags import reconcile_usage_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized like/comment/share counters on posts and tag usage counts, and repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--field', action='append', choices=sorted(COUNTERS) + ['usage_count'],
+                            help='Only reconcile this counter (may be repeated).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted posts without fixing them.')
+
+    def handle(self, *args, **options):
+        fields = options['field'] or [*COUNTERS, 'usage_count']
+        post_fields = [field for field in fields if field in COUNTERS]
+        fixed = reconcile_counters(post_fields, dry_run=options['dry_run']) if post_fields else {}
+        verb = 'drifted' if options['dry_run'] else 'repaired'
+        for field, count in fixed.items():
+            self.stdout.write(f'{field}: {count} post(s) {verb}')
+        if 'usage_count' in fields:
+            count = reconcile_usage_counts(dry_run=options['dry_run'])
+            self.stdout.write(f'usage_count: {count} tag(s) {verb}')
+        self.stdout.write(self.style.SUCCESS('Done.'))
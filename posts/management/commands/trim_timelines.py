@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.timeline import trim_timelines
+
+
+class Command(BaseCommand):
+    help = 'Cut every home timeline back to its newest entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, default=settings.TIMELINE_MAX_ENTRIES,
+                            help='Entries kept per timeline.')
+
+    def handle(self, *args, **options):
+        deleted = trim_timelines(options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} timeline entry(ies).'))
@@ -0,0 +1,58 @@
+from django.db import OperationalError, migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+                    "text, username, tags, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite built without FTS5: search falls back to icontains.
+                return
+            cursor.execute(
+                "INSERT INTO posts_post_search (rowid, text, username, tags) "
+                "SELECT p.id, p.text, u.username, "
+                "COALESCE((SELECT group_concat(t.name, ' ') FROM posts_post_tags pt "
+                "JOIN posts_tag t ON t.id = pt.tag_id WHERE pt.post_id = p.id), '') "
+                "FROM posts_post p JOIN auth_user u ON u.id = p.user_id"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "CREATE TABLE posts_post_search ("
+                "post_id bigint PRIMARY KEY REFERENCES posts_post (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE INDEX posts_post_search_document ON posts_post_search USING GIN (document)"
+            )
+            cursor.execute(
+                "INSERT INTO posts_post_search (post_id, document) "
+                "SELECT p.id, "
+                "setweight(to_tsvector('simple', p.text), 'A') "
+                "|| setweight(to_tsvector('simple', u.username), 'B') "
+                "|| setweight(to_tsvector('simple', COALESCE((SELECT string_agg(t.name, ' ') "
+                "FROM posts_post_tags pt JOIN posts_tag t ON t.id = pt.tag_id "
+                "WHERE pt.post_id = p.id), '')), 'B') "
+                "FROM posts_post p JOIN auth_user u ON u.id = p.user_id"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS posts_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('tag', 'Tag')], max_length=4)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('score', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', '-score'], name='posts_trending_rank')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
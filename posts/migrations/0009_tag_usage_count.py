@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    Tag = apps.get_model('posts', 'Tag')
+    Through = apps.get_model('posts', 'Post').tags.through
+    counts = (
+        Through.objects.filter(tag_id=OuterRef('pk'))
+        .order_by()
+        .values('tag_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Tag.objects.update(usage_count=Coalesce(Subquery(counts), 0))
+
+
+def create_prefix_index(apps, schema_editor):
+    # The unique index on name already serves prefix ranges on SQLite;
+    # PostgreSQL needs a pattern_ops index for LIKE 'prefix%'.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX posts_tag_name_prefix_idx ON posts_tag (name varchar_pattern_ops)')
+
+
+def drop_prefix_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS posts_tag_name_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
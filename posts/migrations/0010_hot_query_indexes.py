@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_tag_usage_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='block',
+            index=models.Index(fields=['blocker', '-timestamp', '-id'], name='posts_block_blocker_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'timestamp'], name='posts_comment_post_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-timestamp', '-id'], name='posts_post_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='posts_post_user_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('is_resolved', False)), fields=['-timestamp'], name='posts_report_open'),
+        ),
+    ]
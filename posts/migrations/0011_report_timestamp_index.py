@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='report',
+            name='posts_report_open',
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('is_resolved', False)), fields=['-timestamp', '-id'], name='posts_report_open'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['-timestamp', '-id'], name='posts_report_ts'),
+        ),
+    ]
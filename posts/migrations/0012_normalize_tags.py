@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:57
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+NAME_LENGTH = 30
+
+
+def normalize_tag(name):
+    # Frozen copy of posts.tags.normalize_tag as of this migration
+    name = unicodedata.normalize('NFKC', name).strip().lstrip('#').strip().casefold()
+    name = re.sub(r'\s+', '-', name)
+    return name[:NAME_LENGTH].strip('-')
+
+
+def normalize_tags(apps, schema_editor):
+    """Rename tags to their normalised form, merging tags that collide."""
+    Tag = apps.get_model('posts', 'Tag')
+    Post = apps.get_model('posts', 'Post')
+    Through = Post.tags.through
+
+    groups = defaultdict(list)
+    for tag in Tag.objects.order_by('pk'):
+        groups[normalize_tag(tag.name)].append(tag)
+
+    changed_posts = set()
+    for name, tags in groups.items():
+        if all(tag.name == name for tag in tags):
+            continue
+        changed_posts.update(Through.objects.filter(tag__in=tags).values_list('post_id', flat=True))
+        if not name:
+            # Nothing left after normalising (e.g. '#'): drop the tag
+            Tag.objects.filter(pk__in=[tag.pk for tag in tags]).delete()
+            continue
+        # Keep the tag already named correctly, else the oldest
+        keep = next((tag for tag in tags if tag.name == name), tags[0])
+        merged = [tag.pk for tag in tags if tag.pk != keep.pk]
+        if merged:
+            tagged = set(Through.objects.filter(tag=keep).values_list('post_id', flat=True))
+            moved = set(Through.objects.filter(tag_id__in=merged).values_list('post_id', flat=True)) - tagged
+            Through.objects.bulk_create([Through(post_id=post_id, tag_id=keep.pk) for post_id in moved])
+            Tag.objects.filter(pk__in=merged).delete()
+        if keep.name != name:
+            Tag.objects.filter(pk=keep.pk).update(name=name)
+
+    counts = (
+        Through.objects.filter(tag_id=OuterRef('pk'))
+        .order_by()
+        .values('tag_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Tag.objects.update(usage_count=Coalesce(Subquery(counts), 0))
+    # Tag names are shown on the cached feed cards
+    Post.objects.filter(pk__in=changed_posts).update(cache_version=F('cache_version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_report_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_tags, migrations.RunPython.noop),
+    ]
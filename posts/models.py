@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Q
 from django.contrib.auth.models import User
+from users.models import Follow
 
 # Create your models here.
 
@@ -11,30 +13,106 @@ class Category(models.Model):
         return self.name
 
 class Tag(models.Model):
+    # Normalised by posts.tags.normalize_tag
     name = models.CharField(max_length=30, unique=True)
+    # Number of posts with this tag, maintained by posts.tags
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+class PostQuerySet(models.QuerySet):
+    def visible_to(self, viewer, hidden=None):
+        """Restrict to posts the viewer may see, as a single SQL filter.
+
+        Own posts are always visible. Otherwise the author's privacy setting
+        decides: 'public' (or no settings row yet) is visible to everyone,
+        'friends' only to followers of the author, 'private' to nobody else.
+        Posts by users the viewer blocked or was blocked by are excluded;
+        pass ``hidden`` (``users.graph.hidden_ids(viewer)``) if already loaded.
+        """
+        from users import graph
+
+        public = Q(user__settings__privacy='public') | Q(user__settings__isnull=True)
+        if viewer is None or not viewer.is_authenticated:
+            return self.filter(public)
+
+        follows_author = Exists(
+            Follow.objects.filter(follower=viewer, following=OuterRef('user'))
+        )
+        posts = self.filter(
+            Q(user=viewer)
+            | public
+            | (Q(user__settings__privacy='friends') & follows_author)
+        )
+        if hidden is None:
+            hidden = graph.hidden_ids(viewer)
+        if hidden:
+            posts = posts.exclude(user_id__in=hidden)
+        return posts
+
+    def bump_cache_version(self):
+        """Invalidate the cached feed cards of these posts."""
+        return self.update(cache_version=F('cache_version') + 1)
+
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     timestamp = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
     shared_from = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='shares')
     is_shared = models.BooleanField(default=False)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
+    # Part of the feed card's fragment cache key; bumped whenever the card changes
+    cache_version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Feed and profile keyset pagination (newest first)
+            models.Index(fields=['-timestamp', '-id'], name='posts_post_ts'),
+            models.Index(fields=['user', '-timestamp', '-id'], name='posts_post_user_ts'),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} at {self.timestamp}"
 
+class TimelineEntry(models.Model):
+    """A post materialised into one user's home timeline (fan-out on write)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-post'], name='posts_timeline_user_ts'),
+            models.Index(fields=['user', 'author'], name='posts_timeline_user_author'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in {self.user_id}'s timeline"
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'timestamp'], name='posts_comment_post_ts'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.id}"
 
@@ -64,6 +142,14 @@ class Report(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Moderation queue: unresolved reports, newest first
+            models.Index(fields=['-timestamp', '-id'], condition=Q(is_resolved=False), name='posts_report_open'),
+            # Admin changelist over all reports, newest first
+            models.Index(fields=['-timestamp', '-id'], name='posts_report_ts'),
+        ]
+
     def __str__(self):
         return f"Report by {self.reporter.username} on {self.reported_user.username}"
 
@@ -74,6 +160,32 @@ class Block(models.Model):
 
     class Meta:
         unique_together = ('blocker', 'blocked_user')
+        indexes = [
+            # A user's block list, newest first
+            models.Index(fields=['blocker', '-timestamp', '-id'], name='posts_block_blocker_ts'),
+        ]
 
     def __str__(self):
         return f"{self.blocker.username} blocked {self.blocked_user.username}"
+
+class TrendingScore(models.Model):
+    """Time-decayed engagement of one post or tag (see ``posts.trending``)."""
+    KIND_CHOICES = [
+        ('post', 'Post'),
+        ('tag', 'Tag'),
+    ]
+
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Natural log of the epoch-normalised score
+    score = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+        indexes = [
+            models.Index(fields=['kind', '-score'], name='posts_trending_rank'),
+        ]
+
+    def __str__(self):
+        return f"Trending {self.kind} {self.object_id}"
@@ -0,0 +1,75 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+def encode_cursor(obj, key=('timestamp', 'id')):
+    """Build an opaque cursor pointing just past the given row."""
+    timestamp_field, id_field = key
+    raw = f"{getattr(obj, timestamp_field).isoformat()}|{getattr(obj, id_field)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_keyset(queryset, cursor=None, page_size=None, key=('timestamp', 'id')):
+    """Return one page of rows (newest first) and the cursor for the next page.
+
+    Ordering is on the ``key`` columns, (timestamp, id) by default, and the
+    page boundary is a WHERE clause on those columns, so the cost of a page
+    does not depend on how deep it is. The next cursor is None on the last
+    page.
+    """
+    if page_size is None:
+        page_size = settings.FEED_PAGE_SIZE
+    timestamp_field, id_field = key
+
+    queryset = queryset.order_by(f'-{timestamp_field}', f'-{id_field}')
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{timestamp_field}__lt': timestamp})
+            | Q(**{timestamp_field: timestamp, f'{id_field}__lt': pk})
+        )
+
+    page = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1], key)
+    return page, next_cursor
+
+
+def paginate_offset(queryset, page=1, page_size=None):
+    """Return one page of an already ordered queryset and the next page number.
+
+    Used where the ordering is not a keyset, such as relevance-ranked search
+    results. The next page number is None on the last page.
+    """
+    if page_size is None:
+        page_size = settings.FEED_PAGE_SIZE
+    try:
+        page = max(int(page), 1)
+    except (TypeError, ValueError):
+        page = 1
+
+    start = (page - 1) * page_size
+    items = list(queryset[start:start + page_size + 1])
+    next_page = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_page = page + 1
+    return items, next_page
@@ -0,0 +1,143 @@
+"""Full-text search over posts.
+
+Each post has one row in ``posts_post_search`` holding its text, its author's
+username and its tag names. On SQLite that table is an FTS5 virtual table
+keyed by the post id (``rowid``); on PostgreSQL it is a ``tsvector`` column
+with a GIN index. The table is created by migration 0005 when the database
+supports it and kept in sync by the receivers in ``posts.signals``.
+
+When no index is available (or ``POST_SEARCH_BACKEND = 'none'``) searches
+fall back to the original ``icontains`` filter.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'posts_post_search'
+
+SQLITE = 'sqlite_fts5'
+POSTGRES = 'postgres'
+
+
+@lru_cache(maxsize=None)
+def _index_exists():
+    return SEARCH_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    """Name of the active search backend, or None to use the fallback."""
+    configured = settings.POST_SEARCH_BACKEND
+    if configured == 'none':
+        return None
+    if configured == 'auto':
+        configured = {'sqlite': SQLITE, 'postgresql': POSTGRES}.get(connection.vendor)
+    if configured is None or not _index_exists():
+        return None
+    return configured
+
+
+def _fts5_query(query):
+    """Turn free text into an FTS5 expression: every word, prefix-matched."""
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def _document(post):
+    # Iterate tags.all() so a prefetch (as in rebuild_index) is used
+    tags = ' '.join(tag.name for tag in post.tags.all())
+    return post.text, post.user.username, tags
+
+
+def index_post(post):
+    """Insert or refresh the search row for a post."""
+    backend = get_backend()
+    if backend is None:
+        return
+    text, username, tags = _document(post)
+    with connection.cursor() as cursor:
+        if backend == SQLITE:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, text, username, tags) VALUES (%s, %s, %s, %s)',
+                [post.pk, text, username, tags],
+            )
+        else:
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (post_id, document)
+                VALUES (%s,
+                        setweight(to_tsvector('simple', %s), 'A')
+                        || setweight(to_tsvector('simple', %s), 'B')
+                        || setweight(to_tsvector('simple', %s), 'B'))
+                ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                [post.pk, text, username, tags],
+            )
+
+
+def remove_post(post_id):
+    """Drop a post from the search index."""
+    backend = get_backend()
+    if backend is None:
+        return
+    column = 'rowid' if backend == SQLITE else 'post_id'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE {column} = %s', [post_id])
+
+
+def rebuild_index(posts):
+    """Re-index the given posts; return how many were indexed."""
+    count = 0
+    for post in posts.select_related('user').prefetch_related('tags').iterator(chunk_size=500):
+        index_post(post)
+        count += 1
+    return count
+
+
+def search_posts(queryset, query):
+    """Filter a post queryset by a search query.
+
+    With an index the result is annotated with ``search_rank`` (higher is
+    more relevant) and ordered by it. Otherwise the original substring match
+    over text, username and tags is applied and the ordering is left alone.
+    The second return value says whether the results are relevance ranked.
+    """
+    backend = get_backend()
+    if backend == SQLITE:
+        match = _fts5_query(query)
+        if not match:
+            return queryset.none(), True
+        matches = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (match,))
+        rank = RawSQL(
+            f'SELECT -bm25({SEARCH_TABLE}, 2.0, 1.0, 1.0) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = posts_post.id',
+            (match,),
+        )
+    elif backend == POSTGRES:
+        matches = RawSQL(
+            f"SELECT post_id FROM {SEARCH_TABLE} "
+            f"WHERE document @@ websearch_to_tsquery('simple', %s)",
+            (query,),
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, websearch_to_tsquery('simple', %s)) "
+            f"FROM {SEARCH_TABLE} WHERE post_id = posts_post.id",
+            (query,),
+        )
+    else:
+        return queryset.filter(
+            Q(text__icontains=query) |
+            Q(user__username__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct(), False
+
+    ranked = (
+        queryset.filter(id__in=matches)
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', '-timestamp', '-id')
+    )
+    return ranked, True
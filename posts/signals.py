@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import Profile
+from .models import Category, Post, Tag
+from .search import index_post, remove_post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, created, **kwargs):
+    # create_post indexes new posts itself once their tags are attached
+    if created and getattr(instance, '_index_after_tags', False):
+        return
+    index_post(instance)
+    if not created:
+        Post.objects.filter(pk=instance.pk).bump_cache_version()
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+def _refresh_posts(post_ids):
+    """Reindex posts and invalidate their cached cards."""
+    posts = Post.objects.filter(pk__in=post_ids)
+    for post in posts:
+        index_post(post)
+    posts.bump_cache_version()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_tags(sender, instance, action, reverse, **kwargs):
+    if reverse and action == 'pre_clear':
+        # clear() does not say which posts lose the tag; remember them
+        instance._cleared_post_ids = list(Post.objects.filter(tags=instance).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_post(instance)
+        Post.objects.filter(pk=instance.pk).bump_cache_version()
+    elif action == 'post_clear':
+        _refresh_posts(getattr(instance, '_cleared_post_ids', []))
+    else:
+        _refresh_posts(kwargs['pk_set'] or [])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_tag_usage(sender, instance, action, reverse, pk_set, **kwargs):
+    # Changes made through the ORM (admin); posts.tags.tag_post counts its own.
+    if action in ('post_add', 'post_remove') and pk_set:
+        delta = len(pk_set) if reverse else 1
+        if action == 'post_remove':
+            delta = -delta
+        tags = Tag.objects.filter(pk=instance.pk) if reverse else Tag.objects.filter(pk__in=pk_set)
+        tags.update(usage_count=Greatest(F('usage_count') + delta, 0))
+    elif action == 'pre_clear':
+        if reverse:
+            Tag.objects.filter(pk=instance.pk).update(usage_count=0)
+        else:
+            instance.tags.filter(usage_count__gt=0).update(usage_count=F('usage_count') - 1)
+
+
+@receiver(pre_delete, sender=Post)
+def release_post_tags(sender, instance, **kwargs):
+    instance.tags.filter(usage_count__gt=0).update(usage_count=F('usage_count') - 1)
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_posts(sender, instance, created, **kwargs):
+    # Category names are shown on feed cards.
+    if not created:
+        Post.objects.filter(category=instance).bump_cache_version()
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag_posts(sender, instance, created, **kwargs):
+    if not created:
+        Post.objects.filter(tags=instance).bump_cache_version()
+
+
+# Deleting a tag removes its through rows and deleting a category nulls
+# Post.category, both without per-post signals; the posts are collected
+# before the delete and refreshed after it.
+@receiver(pre_delete, sender=Tag)
+def remember_tag_posts(sender, instance, **kwargs):
+    instance._post_ids = list(Post.objects.filter(tags=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_tag_posts(sender, instance, **kwargs):
+    _refresh_posts(getattr(instance, '_post_ids', []))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_posts(sender, instance, **kwargs):
+    instance._post_ids = list(Post.objects.filter(category=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def refresh_category_posts(sender, instance, **kwargs):
+    Post.objects.filter(pk__in=getattr(instance, '_post_ids', [])).bump_cache_version()
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_cards(sender, instance, created, **kwargs):
+    # The author header on feed cards is cached per profile version.
+    if not created:
+        Profile.objects.filter(pk=instance.pk).update(cache_version=F('cache_version') + 1)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    # Compared on save instead of re-reading the row; None (deferred) counts as changed
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def refresh_author_posts(sender, instance, created, update_fields=None, **kwargs):
+    loaded, instance._loaded_username = instance._loaded_username, instance.username
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    # Usernames are part of the search document.
+    if loaded == instance.username:
+        return
+    for post in Post.objects.filter(user=instance).iterator(chunk_size=500):
+        post.user = instance
+        index_post(post)
+    # Feed cards show the username in the author header and in "shared from".
+    Profile.objects.filter(user=instance).update(cache_version=F('cache_version') + 1)
+    Post.objects.filter(shared_from__user=instance).bump_cache_version()
@@ -0,0 +1,129 @@
+"""Tag normalisation, bulk tagging and usage counts.
+
+``parse_tags`` turns the post form's comma-separated input into normalised,
+de-duplicated names. ``tag_post`` attaches them with a fixed number of
+queries whatever the number of tags: missing tags are created by one
+conflict-ignoring bulk insert, their ids read back in one query, the links
+written by one bulk insert into the through table and the usage counts
+bumped by one UPDATE. Bulk inserts skip ``m2m_changed``, so ``tag_post``
+refreshes the search index and the card cache version itself, unless the
+caller does it (``create_post`` indexes a new post once, after tagging).
+
+``Tag.usage_count`` (posts per tag) is also maintained for tags changed
+through the ORM (admin) by the receivers in ``posts.signals``;
+``reconcile_usage_counts`` repairs any drift.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Post, Tag
+from .search import index_post
+
+MAX_TAGS_PER_POST = 10
+AUTOCOMPLETE_LIMIT = 8
+
+_NAME_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize_tag(name):
+    """'  #Machine  Learning ' -> 'machine-learning' ('' if nothing is left)."""
+    name = unicodedata.normalize('NFKC', name).strip().lstrip('#').strip().casefold()
+    name = re.sub(r'\s+', '-', name)
+    return name[:_NAME_LENGTH].strip('-')
+
+
+def parse_tags(text):
+    """Normalised, de-duplicated tag names from comma-separated input, in order."""
+    names = []
+    for part in text.split(','):
+        name = normalize_tag(part)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def tag_post(post, names, reindex=True):
+    """Add the tags ``names`` (already normalised) to ``post``; return the number added.
+
+    With ``reindex=False`` the caller refreshes the search index and card cache.
+    """
+    if not names:
+        return 0
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    tag_ids = list(Tag.objects.filter(name__in=names).values_list('pk', flat=True))
+    through = Post.tags.through
+    existing = set(through.objects.filter(post=post, tag_id__in=tag_ids).values_list('tag_id', flat=True))
+    added = [tag_id for tag_id in tag_ids if tag_id not in existing]
+    if not added:
+        return 0
+    through.objects.bulk_create(
+        [through(post_id=post.pk, tag_id=tag_id) for tag_id in added],
+        ignore_conflicts=True,
+    )
+    Tag.objects.filter(pk__in=added).update(usage_count=F('usage_count') + 1)
+    if reindex:
+        # Bulk inserts send no m2m_changed, so do what its receiver would
+        index_post(post)
+        Post.objects.filter(pk=post.pk).bump_cache_version()
+    return len(added)
+
+
+def _prefix(prefix):
+    if connection.vendor == 'postgresql':
+        # Served by the varchar_pattern_ops index from migration 0009
+        return Q(name__startswith=prefix)
+    # A closed range on the unique index; SQLite's LIKE is case-insensitive
+    # and cannot use it.
+    return Q(name__gte=prefix, name__lt=prefix + '\U0010ffff')
+
+
+def _autocomplete_queryset(prefix, limit):
+    return (
+        Tag.objects.filter(_prefix(prefix))
+        .order_by('-usage_count', 'name')
+        .values('name', 'usage_count')[:limit]
+    )
+
+
+def autocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """Tags starting with ``query``, most used first, as dicts of name and usage_count."""
+    prefix = normalize_tag(query)
+    if not prefix:
+        return []
+    return list(_autocomplete_queryset(prefix, limit))
+
+
+async def aautocomplete(query, limit=AUTOCOMPLETE_LIMIT):
+    """Async version of ``autocomplete``."""
+    prefix = normalize_tag(query)
+    if not prefix:
+        return []
+    return [tag async for tag in _autocomplete_queryset(prefix, limit)]
+
+
+def actual_usage_count():
+    """Expression computing the true number of posts of each tag."""
+    counts = (
+        Post.tags.through.objects.filter(tag_id=OuterRef('pk'))
+        .order_by()
+        .values('tag_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_usage_counts(dry_run=False):
+    """Repair drifted usage counts; return the number of tags fixed."""
+    drifted = (
+        Tag.objects.annotate(actual=actual_usage_count())
+        .exclude(usage_count=F('actual'))
+        .values_list('pk', flat=True)
+    )
+    if dry_run:
+        return drifted.count()
+    return Tag.objects.filter(pk__in=drifted).update(usage_count=actual_usage_count())
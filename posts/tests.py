@@ -1,3 +1,336 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.replicas import PIN_COOKIE
+from core.testing import QueryBudgetMixin, make_user
+from users.models import Follow, Profile
+from .counters import reconcile_counters
+from .search import SEARCH_TABLE, search_posts
+from . import trending
+from .models import Block, Category, Comment, Like, Post, Tag, TimelineEntry, TrendingScore
+from .tags import tag_post
+from .timeline import fan_out_post, timeline_page, trim_timelines, trim_unfollow
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query budgets of the busiest post views; enough rows that an N+1 shows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_user('viewer')
+        category = Category.objects.create(name='news')
+        authors = [make_user(f'author{index}', privacy) for index, privacy in
+                   enumerate(['public', 'friends', 'private', 'public', 'public'])]
+        for author in authors:
+            Follow.objects.create(follower=cls.viewer, following=author)
+        for index in range(15):
+            post = Post.objects.create(user=authors[index % len(authors)], text=f'Post {index}', category=category)
+            tag_post(post, ['django', f'topic-{index % 3}'])
+            Like.objects.create(post=post, user=cls.viewer)
+            Comment.objects.create(post=post, user=authors[0], text='Nice')
+        cls.post = post
+
+    def setUp(self):
+        # Feed cards and graph sets are cached; measure the cold path
+        cache.clear()
+        self.client.force_login(self.viewer)
+        # Read from the primary even with DB_REPLICAS set: the test replica
+        # cannot see rows inside the test case's transaction
+        self.client.cookies[PIN_COOKIE] = '1'
+
+    def test_home_feed(self):
+        with self.assertQueryBudget(9):
+            response = self.client.get(reverse('posts:home_feed'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_home_feed_following(self):
+        with self.assertQueryBudget(10):
+            response = self.client.get(reverse('posts:home_feed'), {'feed': 'following'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail(self):
+        with self.assertQueryBudget(6):
+            response = self.client.get(reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_users(self):
+        with self.assertQueryBudget(6):
+            response = self.client.get(reverse('posts:search_users'), {'q': 'author'})
+        self.assertEqual(response.status_code, 200)
+
+
+class VisibleToTests(TestCase):
+    """``Post.objects.visible_to``: privacy settings, follows and blocks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # A private viewer: their own posts are visible only to themselves
+        cls.viewer = make_user('viewer', 'private')
+        cls.posts = {}
+        for privacy in ['public', 'friends', 'private']:
+            author = make_user(f'{privacy}_author', privacy)
+            cls.posts[privacy] = Post.objects.create(user=author, text=privacy)
+        cls.followed_friend = make_user('followed_friend', 'friends')
+        Follow.objects.create(follower=cls.viewer, following=cls.followed_friend)
+        cls.posts['followed_friend'] = Post.objects.create(user=cls.followed_friend, text='friends')
+        cls.posts['own'] = Post.objects.create(user=cls.viewer, text='own')
+        cls.viewer_blocked = make_user('viewer_blocked')
+        Block.objects.create(blocker=cls.viewer, blocked_user=cls.viewer_blocked)
+        cls.posts['viewer_blocked'] = Post.objects.create(user=cls.viewer_blocked, text='blocked')
+        cls.blocks_viewer = make_user('blocks_viewer')
+        Block.objects.create(blocker=cls.blocks_viewer, blocked_user=cls.viewer)
+        cls.posts['blocks_viewer'] = Post.objects.create(user=cls.blocks_viewer, text='blocker')
+
+    def setUp(self):
+        cache.clear()
+
+    def visible(self, viewer):
+        ids = set(Post.objects.visible_to(viewer).values_list('pk', flat=True))
+        return {name for name, post in self.posts.items() if post.pk in ids}
+
+    def test_anonymous(self):
+        expected = {'public', 'viewer_blocked', 'blocks_viewer'}
+        self.assertEqual(self.visible(AnonymousUser()), expected)
+        self.assertEqual(self.visible(None), expected)
+
+    def test_authenticated(self):
+        self.assertEqual(self.visible(self.viewer), {'public', 'followed_friend', 'own'})
+
+    def test_blocks_hide_both_ways(self):
+        # The viewer's posts are private, so make them public to see the block apply
+        self.viewer.settings.privacy = 'public'
+        self.viewer.settings.save()
+        self.assertIn('own', self.visible(make_user('stranger')))
+        self.assertNotIn('own', self.visible(self.viewer_blocked))
+        self.assertNotIn('own', self.visible(self.blocks_viewer))
+        self.assertIn('public', self.visible(self.blocks_viewer))
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=3)
+class TimelineTests(TestCase):
+    """Fan-out on write, read-time merge of high-follower authors, trimming."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_user('viewer')
+        cls.friend = make_user('friend')
+        cls.celebrity = make_user('celebrity')
+        Follow.objects.create(follower=cls.viewer, following=cls.friend)
+        Follow.objects.create(follower=cls.viewer, following=cls.celebrity)
+        for index in range(2):
+            Follow.objects.create(follower=make_user(f'fan{index}'), following=cls.celebrity)
+
+    def setUp(self):
+        # The high-follower id set is cached
+        cache.clear()
+
+    def post(self, author, text='Post'):
+        post = Post.objects.create(user=author, text=text)
+        fan_out_post(post)
+        return post
+
+    def entry_posts(self, user):
+        return set(TimelineEntry.objects.filter(user=user).values_list('post_id', flat=True))
+
+    def test_fan_out(self):
+        post = self.post(self.friend)
+        self.assertEqual(self.entry_posts(self.viewer), {post.pk})
+        self.assertEqual(self.entry_posts(self.friend), {post.pk})
+        self.assertEqual(self.entry_posts(self.celebrity), set())
+
+    def test_high_follower_posts_are_merged_at_read_time(self):
+        post = self.post(self.celebrity)
+        self.assertEqual(self.entry_posts(self.viewer), set())
+        posts, _ = timeline_page(self.viewer)
+        self.assertEqual([p.pk for p in posts], [post.pk])
+
+    def test_unfollow_trims(self):
+        self.post(self.friend)
+        Follow.objects.filter(follower=self.viewer, following=self.friend).delete()
+        trim_unfollow(self.viewer, self.friend)
+        self.assertEqual(self.entry_posts(self.viewer), set())
+
+    def test_cursor_continues_across_merged_sources(self):
+        posts = [self.post(author, f'Post {index}')
+                 for index, author in enumerate([self.friend, self.celebrity, self.viewer] * 3)]
+        seen, cursor = [], None
+        while True:
+            page, cursor = timeline_page(self.viewer, cursor, page_size=2)
+            seen += [post.pk for post in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+
+    def test_trim_keeps_newest_entries(self):
+        posts = [self.post(self.friend, f'Post {index}') for index in range(5)]
+        self.assertEqual(trim_timelines(max_entries=2), 6)
+        self.assertEqual(self.entry_posts(self.viewer), {posts[-1].pk, posts[-2].pk})
+        self.assertEqual(self.entry_posts(self.friend), {posts[-1].pk, posts[-2].pk})
+
+
+class CounterTests(TestCase):
+    """The denormalized counters follow the rows they count."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.reader = make_user('reader')
+        cls.post = Post.objects.create(user=cls.author, text='Post')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def assertCountersMatch(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, Like.objects.filter(post=self.post).count())
+        self.assertEqual(self.post.comment_count, Comment.objects.filter(post=self.post).count())
+        self.assertEqual(self.post.share_count, Post.objects.filter(shared_from=self.post).count())
+
+    def test_like_and_unlike(self):
+        self.client.post(reverse('posts:like_post', args=[self.post.pk]))
+        self.assertCountersMatch()
+        self.assertEqual(self.post.like_count, 1)
+        self.client.post(reverse('posts:like_post', args=[self.post.pk]))
+        self.assertCountersMatch()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_add_and_delete(self):
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]), {'text': 'Nice'})
+        self.assertCountersMatch()
+        self.assertEqual(self.post.comment_count, 1)
+        comment = Comment.objects.get(post=self.post)
+        self.client.post(reverse('posts:delete_comment', args=[comment.pk]))
+        self.assertCountersMatch()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_share(self):
+        self.client.post(reverse('posts:share_post', args=[self.post.pk]), {'text': 'Look'})
+        self.assertCountersMatch()
+        self.assertEqual(self.post.share_count, 1)
+
+    def test_reconcile_repairs_drift(self):
+        Like.objects.create(post=self.post, user=self.reader)
+        Post.objects.filter(pk=self.post.pk).update(like_count=5, comment_count=3)
+        self.assertEqual(reconcile_counters(dry_run=True), {'like_count': 1, 'comment_count': 1, 'share_count': 0})
+        self.assertEqual(reconcile_counters(), {'like_count': 1, 'comment_count': 1, 'share_count': 0})
+        self.assertCountersMatch()
+        self.assertEqual(self.post.like_count, 1)
+
+
+class CreatePostTests(TestCase):
+
+    def test_new_post_is_indexed_once_with_its_tags(self):
+        self.client.force_login(make_user('author'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('posts:create_post'), {'text': 'Hello', 'tags': 'Django, #Python'})
+        writes = [query for query in queries if f'INSERT INTO {SEARCH_TABLE}' in query['sql']]
+        self.assertEqual(len(writes), 1)
+        post = Post.objects.get()
+        results, _ = search_posts(Post.objects.all(), 'python')
+        self.assertEqual(list(results), [post])
+
+
+class UsernameChangeTests(TestCase):
+
+    def test_only_username_changes_refresh_cards(self):
+        author = make_user('author')
+        post = Post.objects.create(user=author, text='Hello')
+        with self.assertNumQueries(1):
+            author.save(update_fields=['last_login'])
+        author.first_name = 'Ann'
+        author.save()
+        self.assertEqual(Profile.objects.get(user=author).cache_version, 1)
+        author = User.objects.get(pk=author.pk)
+        author.username = 'renamed'
+        author.save()
+        self.assertEqual(Profile.objects.get(user=author).cache_version, 2)
+        results, _ = search_posts(Post.objects.all(), 'renamed')
+        self.assertEqual(list(results), [post])
+
+
+class LikeStateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_user('viewer')
+        cls.public_post = Post.objects.create(user=make_user('public_author'), text='Public')
+        cls.private_post = Post.objects.create(user=make_user('private_author', 'private'), text='Private')
+
+    def states(self):
+        response = self.client.get(
+            reverse('posts:like_state'), {'ids': f'{self.public_post.pk},{self.private_post.pk}'}
+        )
+        return response.json()['posts']
+
+    def test_hidden_posts_are_left_out(self):
+        self.assertEqual(list(self.states()), [str(self.public_post.pk)])
+        self.client.force_login(self.viewer)
+        self.assertEqual(list(self.states()), [str(self.public_post.pk)])
+
+    def test_set_and_unset_are_idempotent(self):
+        self.client.force_login(self.viewer)
+        for _ in range(2):
+            response = self.client.post(reverse('posts:set_like', args=[self.public_post.pk]))
+            self.assertEqual(response.json(), {'liked': True, 'like_count': 1})
+        self.assertEqual(self.states()[str(self.public_post.pk)], {'liked': True, 'like_count': 1})
+        for _ in range(2):
+            response = self.client.post(reverse('posts:unset_like', args=[self.public_post.pk]))
+            self.assertEqual(response.json(), {'liked': False, 'like_count': 0})
+        self.assertEqual(Like.objects.count(), 0)
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1.0)
+class TrendingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user('author')
+        cls.post = Post.objects.create(user=cls.author, text='Hello')
+        tag_post(cls.post, ['django', 'python'])
+
+    def score(self, kind, object_id, now):
+        return trending.decayed(TrendingScore.objects.get(kind=kind, object_id=object_id).score, now)
+
+    def test_events_add_up_and_decay(self):
+        now = timezone.now()
+        trending.record(self.post.pk, 'like', now)
+        trending.record(self.post.pk, 'comment', now)
+        self.assertAlmostEqual(self.score('post', self.post.pk, now), 4.0)
+        # One half-life later, a share adds its full weight to the halved score
+        later = now + timedelta(hours=1)
+        trending.record(self.post.pk, 'share', later)
+        self.assertAlmostEqual(self.score('post', self.post.pk, later), 7.0)
+
+    def test_tags_get_the_post_events(self):
+        now = timezone.now()
+        trending.record(self.post.pk, 'like', now)
+        trending.record(self.post.pk, 'like', now)
+        for tag in Tag.objects.filter(name__in=['django', 'python']):
+            self.assertAlmostEqual(self.score('tag', tag.pk, now), 2.0)
+        self.assertEqual(TrendingScore.objects.count(), 3)
+
+    def test_compact_keeps_ties_in_the_top(self):
+        now = timezone.now()
+        value = trending.log_score(1.0, now)
+        posts = [Post.objects.create(user=self.author, text=f'Post {index}') for index in range(4)]
+        for post in posts:
+            TrendingScore.objects.create(kind='post', object_id=post.pk, score=value, updated_at=now)
+        # Four tied rows, two kept: exactly two go
+        self.assertEqual(trending.compact(keep=2, now=now), 2)
+        self.assertEqual(TrendingScore.objects.filter(kind='post').count(), 2)
+
+    def test_compact_drops_decayed_and_orphaned_scores(self):
+        now = timezone.now()
+        trending.record(self.post.pk, 'like', now - timedelta(hours=10))
+        other = Post.objects.create(user=self.author, text='Gone')
+        trending.record(other.pk, 'like', now)
+        other.delete()
+        self.assertEqual(trending.compact(now=now), 4)
+        self.assertFalse(TrendingScore.objects.exists())
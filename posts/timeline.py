@@ -0,0 +1,176 @@
+"""Fan-out-on-write home timelines.
+
+Every post is copied into the ``TimelineEntry`` rows of its author and of the
+author's followers when it is created, so reading the "Following" feed is a
+single range scan over one user's entries. Authors with more than
+``TIMELINE_FANOUT_LIMIT`` followers are skipped at write time and their posts
+are merged in when the feed is read instead.
+
+Fan-out only ever appends, so ``trim_timelines`` (run periodically by
+``manage.py trim_timelines``) cuts each timeline back to its newest
+``TIMELINE_MAX_ENTRIES`` entries; older posts drop out of the feed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from users import graph
+from users.models import Follow
+from .models import Post, TimelineEntry
+from .pagination import encode_cursor, paginate_keyset
+
+HIGH_FOLLOWER_CACHE_KEY = 'timeline:high-follower-ids'
+HIGH_FOLLOWER_CACHE_TIMEOUT = 300
+BATCH_SIZE = 1000
+
+
+def high_follower_ids():
+    """Ids of authors whose posts are merged at read time rather than fanned out."""
+    ids = cache.get(HIGH_FOLLOWER_CACHE_KEY)
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.values('following')
+            .annotate(follower_count=Count('id'))
+            .filter(follower_count__gte=settings.TIMELINE_FANOUT_LIMIT)
+            .values_list('following', flat=True)
+        )
+        cache.set(HIGH_FOLLOWER_CACHE_KEY, ids, HIGH_FOLLOWER_CACHE_TIMEOUT)
+    return ids
+
+
+def _entry(user_id, post):
+    return TimelineEntry(
+        user_id=user_id, post_id=post.pk, author_id=post.user_id, timestamp=post.timestamp
+    )
+
+
+def fan_out_post(post):
+    """Write a new post into its author's timeline and, unless the author is
+    a high-follower account, into every follower's timeline."""
+    TimelineEntry.objects.bulk_create([_entry(post.user_id, post)], ignore_conflicts=True)
+    if post.user_id in high_follower_ids():
+        return
+
+    follower_ids = (
+        Follow.objects.filter(following_id=post.user_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(_entry(follower_id, post))
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_follow(follower, following):
+    """Copy the most recent posts of a newly followed author into the follower's timeline."""
+    if following.pk in high_follower_ids():
+        return
+    posts = Post.objects.filter(user=following).order_by('-timestamp', '-id')
+    TimelineEntry.objects.bulk_create(
+        [_entry(follower.pk, post) for post in posts[:settings.TIMELINE_BACKFILL_SIZE]],
+        ignore_conflicts=True,
+    )
+
+
+def trim_unfollow(follower, following):
+    """Remove an unfollowed author's posts from the follower's timeline."""
+    TimelineEntry.objects.filter(user=follower, author=following).delete()
+
+
+def trim_timelines(max_entries=None):
+    """Delete the entries beyond the newest ``max_entries`` of every timeline;
+    return the number of rows deleted."""
+    if max_entries is None:
+        max_entries = settings.TIMELINE_MAX_ENTRIES
+    oversized = (
+        TimelineEntry.objects.values('user')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=max_entries)
+        .values_list('user', flat=True)
+    )
+    deleted = 0
+    for user_id in oversized.iterator():
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        # The oldest entry kept; everything after it in feed order goes
+        last = (
+            entries.order_by('-timestamp', '-post_id')
+            .values_list('timestamp', 'post_id')[max_entries - 1:max_entries]
+            .first()
+        )
+        if last is None:
+            continue
+        timestamp, post_id = last
+        deleted += entries.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, post_id__lt=post_id)
+        ).delete()[0]
+    return deleted
+
+
+def rebuild_timeline(user):
+    """Recreate one user's timeline from their own posts and the authors they follow."""
+    authors = Follow.objects.filter(follower=user).exclude(
+        following__in=high_follower_ids()
+    ).values('following')
+    posts = (
+        Post.objects.filter(Q(user=user) | Q(user__in=authors))
+        .only('user_id', 'timestamp')
+        .order_by('-timestamp', '-id')
+    )
+    entries = [_entry(user.pk, post) for post in posts[:settings.TIMELINE_BACKFILL_SIZE]]
+    # Readers see either the old timeline or the new one, never an empty one
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user=user).delete()
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def timeline_page(viewer, cursor=None, page_size=None):
+    """Return one page of the viewer's "Following" feed and the next cursor.
+
+    Fanned-out posts come from the viewer's timeline entries; posts by
+    followed high-follower accounts are read directly and merged in. Both
+    sources are paged with the same (timestamp, post id) cursor.
+    """
+    if page_size is None:
+        page_size = settings.FEED_PAGE_SIZE
+
+    # Entries only exist for the viewer and the authors they follow, so the
+    # privacy check reduces to "not private" for everyone but the viewer.
+    entries = (
+        TimelineEntry.objects.filter(user=viewer)
+        .filter(Q(author=viewer) | ~Q(author__settings__privacy='private'))
+        .exclude(author__in=graph.hidden_ids(viewer))
+        .select_related('post__user__profile', 'post__category', 'post__shared_from__user')
+        .prefetch_related('post__tags')
+    )
+    entries, entries_cursor = paginate_keyset(
+        entries, cursor, page_size, key=('timestamp', 'post_id')
+    )
+    posts = [entry.post for entry in entries]
+    has_more = entries_cursor is not None
+
+    followed_high = graph.following_ids(viewer) & high_follower_ids()
+    if followed_high:
+        pulled = (
+            Post.objects.filter(user__in=followed_high)
+            .visible_to(viewer)
+            .select_related('user__profile', 'category', 'shared_from__user')
+            .prefetch_related('tags')
+        )
+        pulled, pulled_cursor = paginate_keyset(pulled, cursor, page_size)
+        has_more = has_more or pulled_cursor is not None
+
+        seen = {post.pk for post in posts}
+        posts += [post for post in pulled if post.pk not in seen]
+        posts.sort(key=lambda post: (post.timestamp, post.pk), reverse=True)
+
+    if len(posts) > page_size:
+        posts = posts[:page_size]
+        has_more = True
+    next_cursor = encode_cursor(posts[-1]) if has_more and posts else None
+    return posts, next_cursor
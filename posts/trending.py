@@ -0,0 +1,127 @@
+"""Trending posts and tags.
+
+Likes, comments and shares add ``WEIGHTS[action]`` to the post's
+``TrendingScore`` and to the score of each of its tags, and scores decay
+exponentially with a half-life of ``TRENDING_HALF_LIFE_HOURS``.
+
+Rather than decaying every row as time passes, each event is scaled by the
+time since a fixed ``EPOCH``: an event of weight w at time t adds
+``w * exp((t - EPOCH) / tau)``. All rows share that time base, so the order
+of the stored values is the order of the decayed scores at any moment and
+the top K is a scan of the ``(kind, -score)`` index. The raw values would
+overflow a float within months, so rows store their natural log and an
+event is folded in with log-sum-exp by a single INSERT ... ON CONFLICT (ON
+DUPLICATE KEY UPDATE on MySQL).
+
+Removing a like or comment does not lower a score; trending measures recent
+activity. ``compact_trending`` periodically deletes scores that decayed
+below a floor or whose post or tag is gone, keeping the table small.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import Post, Tag, TrendingScore
+
+WEIGHTS = {
+    'like': 1.0,
+    'comment': 3.0,
+    'share': 5.0,
+}
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+# Entries shown per sidebar list
+TOP_K = 5
+
+
+def _tau():
+    """Decay time constant in seconds."""
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def log_score(score, at):
+    """Stored value of ``score`` as of time ``at``."""
+    return math.log(score) + (at - EPOCH).total_seconds() / _tau()
+
+
+def decayed(value, now=None):
+    """The score a stored value stands for at ``now``."""
+    now = now or timezone.now()
+    return math.exp(value - (now - EPOCH).total_seconds() / _tau())
+
+
+def record(post_id, action, now=None):
+    """Add one ``action`` ('like', 'comment' or 'share') on the post to the
+    post's and its tags' scores, in one statement."""
+    now = now or timezone.now()
+    value = log_score(WEIGHTS[action], now)
+    updated_at = connection.ops.adapt_datetimefield_value(now)
+    table = TrendingScore._meta.db_table
+    rows = (
+        f"SELECT 'post' AS kind, %s AS object_id, %s AS score, %s AS updated_at "
+        f"UNION ALL SELECT 'tag', tag_id, %s, %s FROM {Post.tags.through._meta.db_table} WHERE post_id = %s"
+    )
+    if connection.vendor == 'mysql':
+        # Columns of the derived table can be referenced in the update
+        rows, upsert, new = f'SELECT * FROM ({rows}) AS new', 'ON DUPLICATE KEY UPDATE', 'new'
+    else:
+        upsert, new = 'ON CONFLICT (kind, object_id) DO UPDATE SET', 'excluded'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (kind, object_id, score, updated_at) {rows} {upsert} "
+            f"score = CASE WHEN {table}.score > {new}.score THEN {table}.score ELSE {new}.score END "
+            f"+ LN(1 + EXP(-ABS({table}.score - {new}.score))), "
+            f"updated_at = {new}.updated_at",
+            [post_id, value, updated_at, value, updated_at, post_id],
+        )
+
+
+def _top_ids(kind, limit):
+    """Ids of the ``limit`` highest scoring objects of ``kind``, cached briefly."""
+    key = f'trending:{kind}:{limit}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(
+            TrendingScore.objects.filter(kind=kind)
+            .order_by('-score')
+            .values_list('object_id', flat=True)[:limit]
+        )
+        cache.set(key, ids, settings.TRENDING_CACHE_TIMEOUT)
+    return ids
+
+
+def trending_posts(viewer, limit=TOP_K):
+    """The top trending posts the viewer may see, best first."""
+    # Over-fetch so private and blocked posts can be dropped
+    ids = _top_ids('post', limit * 4)
+    if not ids:
+        return []
+    posts = Post.objects.visible_to(viewer).select_related('user').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts][:limit]
+
+
+def trending_tags(limit=TOP_K):
+    """The top trending tag names, best first."""
+    ids = _top_ids('tag', limit)
+    names = dict(Tag.objects.filter(pk__in=ids).values_list('pk', 'name'))
+    return [names[pk] for pk in ids if pk in names]
+
+
+def compact(min_score=0.05, keep=1000, now=None):
+    """Delete scores below ``min_score`` now, beyond the best ``keep`` per
+    kind, or of deleted posts and tags; return the number of rows deleted."""
+    floor = log_score(min_score, now or timezone.now())
+    deleted = TrendingScore.objects.filter(score__lt=floor).delete()[0]
+    for kind, model in (('post', Post), ('tag', Tag)):
+        scores = TrendingScore.objects.filter(kind=kind)
+        deleted += scores.exclude(object_id__in=model.objects.values('pk')).delete()[0]
+        # By id rather than score, so rows tying the keep-th score survive
+        top = list(scores.order_by('-score', 'pk').values_list('pk', flat=True)[:keep])
+        if len(top) == keep:
+            deleted += scores.exclude(pk__in=top).delete()[0]
+    return deleted
@@ -9,10 +9,15 @@ urlpatterns = [
     path('create/', views.create_post, name='create_post'),
     path('share/<int:post_id>/', views.share_post, name='share_post'),
     path('like/<int:post_id>/', views.like_post, name='like_post'),
+    path('like/<int:post_id>/set/', views.set_like_view, name='set_like'),
+    path('like/<int:post_id>/unset/', views.unset_like_view, name='unset_like'),
+    path('likes/state/', views.like_state, name='like_state'),
     path('comment/add/<int:post_id>/', views.add_comment, name='add_comment'),
     path('comment/edit/<int:comment_id>/', views.edit_comment, name='edit_comment'),
     path('comment/delete/<int:comment_id>/', views.delete_comment, name='delete_comment'),
     path('search/', views.search_users, name='search_users'),
+    path('search/autocomplete/', views.autocomplete_users, name='autocomplete_users'),
+    path('tags/autocomplete/', views.autocomplete_tags, name='autocomplete_tags'),
     path('follow/<int:user_id>/', views.follow_user, name='follow_user'),
     path('report/<int:user_id>/', views.report_user, name='report_user'),
     path('block/<int:user_id>/', views.block_user, name='block_user'),
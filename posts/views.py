@@ -1,14 +1,29 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, aget_object_or_404, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .models import Post, Comment, Like
 from .forms import PostForm, CommentForm
-from django.db.models import Q
-from .models import Category, Tag, Report, Block
+from .counters import adjust_counter
+from .likes import MAX_STATE_IDS, alike_states, aset_like, atoggle_like, aunset_like
+from .pagination import paginate_keyset, paginate_offset
+from .search import index_post, search_posts
+from .tags import aautocomplete as aautocomplete_tag_names, normalize_tag, tag_post
+from .trending import record as record_trending, trending_posts, trending_tags
+from .timeline import fan_out_post, backfill_follow, trim_unfollow, timeline_page
+from .models import Category, Report, Block
+from core.images import schedule_image_processing
+from core.replicas import read_from_replica
 from users.models import Follow
-from users.views import send_like_notification, send_comment_notification, send_follow_notification
-from django.http import JsonResponse
+from users import graph
+from users import search as user_search
+from users.suggestions import suggestions_for
+from users.views import send_comment_notification, send_follow_notification
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
+from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.conf import settings
 
 User = get_user_model()
 
@@ -16,72 +31,89 @@ User = get_user_model()
 
 # Home feed view with search and filtering
 
+@read_from_replica
 def home_feed(request):
     query = request.GET.get('q', '')
     category_id = request.GET.get('category', '')
     tag_name = request.GET.get('tag', '')
+    cursor = request.GET.get('cursor')
+    feed = request.GET.get('feed', 'all')
+    
+    # The "Following" feed reads the viewer's materialized timeline
+    following_feed = (
+        feed == 'following' and request.user.is_authenticated
+        and not (query or category_id or tag_name)
+    )
     
     posts = Post.objects.all()
+    ranked = False
+    next_cursor = next_page = None
     
     if query:
-        posts = posts.filter(
-            Q(text__icontains=query) | 
-            Q(user__username__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
+        posts, ranked = search_posts(posts, query)
     
     if category_id:
         posts = posts.filter(category_id=category_id)
     
     if tag_name:
-        posts = posts.filter(tags__name=tag_name)
+        posts = posts.filter(tags__name=normalize_tag(tag_name))
     
-    # Filter posts based on privacy settings
-    from users.models import Settings, Follow
-    filtered_posts = []
+    if following_feed:
+        posts, next_cursor = timeline_page(request.user, cursor)
+    else:
+        # Filter posts based on privacy settings
+        posts = (
+            posts.visible_to(request.user)
+            .select_related('user__profile', 'category', 'shared_from__user')
+            .prefetch_related('tags')
+        )
+        if ranked:
+            # Relevance order is not a keyset, so search results page by offset
+            posts, next_page = paginate_offset(posts, request.GET.get('page'))
+        else:
+            posts, next_cursor = paginate_keyset(posts, cursor)
     
-    for post in posts:
-        try:
-            post_owner_settings = Settings.objects.get(user=post.user)
-            privacy_level = post_owner_settings.privacy
-            
-            # Always show own posts
-            if post.user == request.user:
-                filtered_posts.append(post)
-            # Public posts - show to everyone
-            elif privacy_level == 'public':
-                filtered_posts.append(post)
-            # Friends posts - show only to followers
-            elif privacy_level == 'friends':
-                if Follow.objects.filter(follower=request.user, following=post.user).exists():
-                    filtered_posts.append(post)
-            # Private posts - don't show to anyone except owner
-            # (already handled by the first condition)
-                
-        except Settings.DoesNotExist:
-            # If no settings exist, create default settings (public) and show post
-            Settings.objects.create(user=post.user)
-            filtered_posts.append(post)
+    next_page_url = None
+    if next_cursor or next_page:
+        params = request.GET.copy()
+        if next_page:
+            params['page'] = next_page
+        else:
+            params['cursor'] = next_cursor
+        next_page_url = '?' + params.urlencode()
     
-    posts = filtered_posts
-    posts.sort(key=lambda x: x.timestamp, reverse=True)
     categories = Category.objects.all()
     
     return render(request, 'posts/feed.html', {
         'posts': posts, 
+        'next_page_url': next_page_url,
+        'feed': 'following' if following_feed else 'all',
+        'card_cache_timeout': settings.POST_CARD_CACHE_TIMEOUT,
         'categories': categories,
         'query': query,
         'selected_category': category_id,
-        'selected_tag': tag_name
+        'selected_tag': tag_name,
+        'trending_posts': trending_posts(request.user),
+        'trending_tags': trending_tags(),
     })
 
 # Post detail view
 
+@read_from_replica
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all().order_by('timestamp')
+    post = get_object_or_404(
+        Post.objects.select_related('user__profile', 'category', 'shared_from__user'),
+        id=post_id,
+    )
+    comments = post.comments.select_related('user__profile').order_by('timestamp')
     comment_form = CommentForm()
-    return render(request, 'posts/post_detail.html', {'post': post, 'comments': comments, 'comment_form': comment_form})
+    liked = request.user.is_authenticated and Like.objects.filter(post=post, user=request.user).exists()
+    return render(request, 'posts/post_detail.html', {
+        'post': post,
+        'comments': comments,
+        'comment_form': comment_form,
+        'liked': liked,
+    })
 
 # Create post view
 @login_required
@@ -91,14 +123,16 @@ def create_post(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.user = request.user
+            post._index_after_tags = True
             post.save()
+            if post.image:
+                schedule_image_processing(post, 'image')
+            fan_out_post(post)
             
-            # Handle tags
-            tag_names = form.cleaned_data.get('tags', [])
-            if tag_names:
-                for tag_name in tag_names:
-                    tag, created = Tag.objects.get_or_create(name=tag_name.lower())
-                    post.tags.add(tag)
+            # Tags are resolved and attached in bulk, then the post is
+            # indexed once with them (a new post has no cached card yet)
+            tag_post(post, form.cleaned_data.get('tags', []), reindex=False)
+            index_post(post)
             
             # Save many-to-many relationships (excluding tags since we handle them manually)
             form.save_m2m()
@@ -113,59 +147,80 @@ def share_post(request, post_id):
     original_post = get_object_or_404(Post, id=post_id)
     
     if request.method == 'POST':
-        shared_post = Post.objects.create(
-            user=request.user,
-            text=request.POST.get('text', ''),
-            shared_from=original_post,
-            is_shared=True
-        )
+        with transaction.atomic():
+            shared_post = Post.objects.create(
+                user=request.user,
+                text=request.POST.get('text', ''),
+                shared_from=original_post,
+                is_shared=True
+            )
+            adjust_counter(original_post.pk, 'share_count', 1)
+        record_trending(original_post.pk, 'share')
+        fan_out_post(shared_post)
         return redirect('posts:home_feed')
     
     return render(request, 'posts/share_post.html', {'original_post': original_post})
 
 # Search users view
+@read_from_replica
 def search_users(request):
     query = request.GET.get('q', '')
     users = []
+    suggestions = []
+    next_page_url = None
     
     if query:
-        # Only show users who have profile_visible=True in their settings
-        from users.models import Settings
-        users = User.objects.filter(
-            username__icontains=query
-        ).exclude(id=request.user.id)
-        
-        # Filter out users with profile_visible=False
-        visible_users = []
-        for user in users:
-            try:
-                user_settings = Settings.objects.get(user=user)
-                if user_settings.profile_visible:
-                    visible_users.append(user)
-            except Settings.DoesNotExist:
-                # If no settings exist, create default settings and include user
-                Settings.objects.create(user=user)
-                visible_users.append(user)
-        
-        users = visible_users
+        # Prefix match on username; hidden profiles and blocks are filtered in SQL
+        users, next_after = user_search.search_page(request.user, query, request.GET.get('after'))
+        if next_after:
+            params = request.GET.copy()
+            params['after'] = next_after
+            next_page_url = '?' + params.urlencode()
+    else:
+        # Precomputed by "manage.py build_suggestions"
+        suggestions = suggestions_for(request.user)
     
-    return render(request, 'users/search_users.html', {'users': users, 'query': query})
+    return render(request, 'users/search_users.html', {
+        'users': users,
+        'query': query,
+        'suggestions': suggestions,
+        'next_page_url': next_page_url,
+    })
+
+# Username type-ahead (AJAX)
+async def autocomplete_users(request):
+    query = request.GET.get('q', '')
+    user = await request.auser()
+    # Filtering by the viewer's block sets reads the graph cache and the ORM
+    results = await sync_to_async(user_search.autocomplete)(user, query)
+    return JsonResponse({'results': results})
+
+# Tag type-ahead for the post form (AJAX)
+async def autocomplete_tags(request):
+    return JsonResponse({'results': await aautocomplete_tag_names(request.GET.get('q', ''))})
+
+@transaction.atomic
+def _toggle_follow(user, user_to_follow):
+    """Follow (with its notification) or unfollow; return whether now following."""
+    follow, created = Follow.objects.get_or_create(follower=user, following=user_to_follow)
+    if created:
+        send_follow_notification(user, user_to_follow)
+    else:
+        follow.delete()
+    return created
 
 # Follow user view
 @login_required
-def follow_user(request, user_id):
-    user_to_follow = get_object_or_404(User, id=user_id)
+async def follow_user(request, user_id):
+    user = await request.auser()
+    user_to_follow = await aget_object_or_404(User, id=user_id)
     
-    if request.user != user_to_follow:
-        follow, created = Follow.objects.get_or_create(
-            follower=request.user,
-            following=user_to_follow
-        )
-        if created:
-            # Send follow notification email
-            send_follow_notification(request.user, user_to_follow)
+    if user != user_to_follow:
+        if await sync_to_async(_toggle_follow)(user, user_to_follow):
+            await sync_to_async(backfill_follow)(user, user_to_follow)
         else:
-            follow.delete()
+            await sync_to_async(trim_unfollow)(user, user_to_follow)
+        await graph.ainvalidate_follow(user.pk)
     
     return redirect('posts:search_users')
 
@@ -198,6 +253,7 @@ def block_user(request, user_id):
         )
         if not created:
             block.delete()
+        graph.invalidate_block(request.user.pk, user_to_block.pk)
     
     return redirect('posts:search_users')
 
@@ -212,6 +268,7 @@ def unblock_user(request, user_id):
             blocked_user=user_to_unblock
         )
         block.delete()
+        graph.invalidate_block(request.user.pk, user_to_unblock.pk)
         messages.success(request, f'You have unblocked {user_to_unblock.username}.')
     except Block.DoesNotExist:
         messages.warning(request, f'{user_to_unblock.username} was not blocked.')
@@ -220,32 +277,58 @@ def unblock_user(request, user_id):
 
 # Like/unlike post (AJAX)
 @login_required
-def like_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    liked = False
-    like_obj = Like.objects.filter(post=post, user=request.user)
-    if like_obj.exists():
-        like_obj.delete()
-    else:
-        Like.objects.create(post=post, user=request.user)
-        liked = True
-        # Send like notification email
-        send_like_notification(post, request.user)
-    return JsonResponse({'liked': liked, 'like_count': post.likes.count()})
+async def like_post(request, post_id):
+    post, liked = await atoggle_like(await request.auser(), post_id)
+    if post is None:
+        raise Http404('No Post matches the given query.')
+    return JsonResponse({'liked': liked, 'like_count': post.like_count})
+
+# Idempotent like/unlike (AJAX): safe to repeat, e.g. on double clicks
+@login_required
+@require_POST
+async def set_like_view(request, post_id):
+    post, _ = await aset_like(await request.auser(), post_id)
+    if post is None:
+        raise Http404('No Post matches the given query.')
+    return JsonResponse({'liked': True, 'like_count': post.like_count})
+
+@login_required
+@require_POST
+async def unset_like_view(request, post_id):
+    post, _ = await aunset_like(await request.auser(), post_id)
+    if post is None:
+        raise Http404('No Post matches the given query.')
+    return JsonResponse({'liked': False, 'like_count': post.like_count})
+
+# Viewer's like state and counts for a batch of posts (AJAX)
+async def like_state(request):
+    try:
+        post_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk][:MAX_STATE_IDS]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of post ids'}, status=400)
+    states = await alike_states(await request.auser(), post_ids)
+    return JsonResponse({'posts': {str(pk): state for pk, state in states.items()}})
+
+@transaction.atomic
+def _save_comment(comment):
+    comment.save()
+    adjust_counter(comment.post_id, 'comment_count', 1)
+    # Send comment notification email
+    send_comment_notification(comment.post, comment.user, comment)
 
 # Add comment
 @login_required
-def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+async def add_comment(request, post_id):
+    post = await aget_object_or_404(Post.objects.select_related('user'), id=post_id)
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
+            user = await request.auser()
             comment = form.save(commit=False)
-            comment.user = request.user
+            comment.user = user
             comment.post = post
-            comment.save()
-            # Send comment notification email
-            send_comment_notification(post, request.user)
+            await sync_to_async(_save_comment)(comment)
+            await sync_to_async(record_trending)(post.pk, 'comment')
     return redirect('posts:post_detail', post_id=post_id)
 
 # Edit comment
@@ -265,6 +348,8 @@ def edit_comment(request, comment_id):
 @login_required
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, user=request.user)
-    post_id = comment.post.id
-    comment.delete()
+    post_id = comment.post_id
+    with transaction.atomic():
+        comment.delete()
+        adjust_counter(post_id, 'comment_count', -1)
     return redirect('posts:post_detail', post_id=post_id)
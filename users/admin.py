@@ -1,8 +1,28 @@
 from django.contrib import admin
+
+from core.admin import LargeTableAdmin
 from .models import Profile, Settings, Follow
 
-# Register your models here.
 
-admin.site.register(Profile)
-admin.site.register(Settings)
-admin.site.register(Follow)
+@admin.register(Profile)
+class ProfileAdmin(LargeTableAdmin):
+    list_display = ('user',)
+    list_select_related = ('user',)
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(Settings)
+class SettingsAdmin(LargeTableAdmin):
+    list_display = ('user', 'privacy', 'email_notifications', 'email_frequency')
+    list_select_related = ('user',)
+    search_fields = ('=user__username',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(Follow)
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('id', 'follower', 'following', 'created_at')
+    list_select_related = ('follower', 'following')
+    search_fields = ('=follower__username',)
+    autocomplete_fields = ('follower', 'following')
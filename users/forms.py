@@ -38,4 +38,4 @@ class ProfileForm(forms.ModelForm):
 class SettingsForm(forms.ModelForm):
     class Meta:
         model = Settings
-        fields = ['privacy', 'email_notifications', 'profile_visible']
\ No newline at end of file
+        fields = ['privacy', 'email_notifications', 'email_frequency', 'profile_visible']
\ No newline at end of file
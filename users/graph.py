@@ -0,0 +1,138 @@
+"""Cached social graph.
+
+A user's following set, the set of users they blocked and the set of users
+who blocked them are each loaded with one query and kept in the Django cache
+as frozensets of user ids, so relationship checks during a request are set
+lookups instead of ``exists()`` queries. The views that change follows and
+blocks call ``invalidate_follow``/``invalidate_block``; entries also expire
+after ``SOCIAL_GRAPH_CACHE_TIMEOUT`` seconds as a backstop for changes made
+elsewhere (admin, cascading deletes).
+
+Invalidation only reaches other workers through a shared cache. Block sets
+decide what people may see, so with a per-process cache (the default
+``LocMemCache``) they are read from the database on every use instead;
+``manage.py check --deploy`` warns about that setup.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+
+from posts.models import Block
+from .models import Follow
+
+FOLLOWING = 'following'
+BLOCKED = 'blocked'
+BLOCKED_BY = 'blocked-by'
+
+# Read from the primary: a set cached from a lagging replica would outlive the lag
+_QUERIES = {
+    FOLLOWING: lambda user_id: Follow.objects.using(DEFAULT_DB_ALIAS)
+    .filter(follower_id=user_id).values_list('following_id', flat=True),
+    BLOCKED: lambda user_id: Block.objects.using(DEFAULT_DB_ALIAS)
+    .filter(blocker_id=user_id).values_list('blocked_user_id', flat=True),
+    BLOCKED_BY: lambda user_id: Block.objects.using(DEFAULT_DB_ALIAS)
+    .filter(blocked_user_id=user_id).values_list('blocker_id', flat=True),
+}
+
+EMPTY = frozenset()
+
+
+def shared_cache():
+    """Whether the default cache is shared between worker processes."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _key(kind, user_id):
+    return f'graph:{kind}:{user_id}'
+
+
+def _user_id(user):
+    if user is None:
+        return None
+    if isinstance(user, int):
+        return user
+    return user.pk if user.is_authenticated else None
+
+
+def _load(user, kinds):
+    """Return {kind: frozenset of ids} for ``user``, filling cache misses."""
+    user_id = _user_id(user)
+    if user_id is None:
+        return {kind: EMPTY for kind in kinds}
+
+    shared = shared_cache()
+    keys = {kind: _key(kind, user_id) for kind in kinds if shared or kind == FOLLOWING}
+    cached = cache.get_many(keys.values())
+    sets = {}
+    missing = {}
+    for kind in kinds:
+        key = keys.get(kind)
+        if key in cached:
+            sets[kind] = cached[key]
+        elif key is None:
+            sets[kind] = frozenset(_QUERIES[kind](user_id))
+        else:
+            sets[kind] = missing[key] = frozenset(_QUERIES[kind](user_id))
+    if missing:
+        cache.set_many(missing, settings.SOCIAL_GRAPH_CACHE_TIMEOUT)
+    return sets
+
+
+def following_ids(user):
+    """Ids of the users ``user`` follows."""
+    return _load(user, [FOLLOWING])[FOLLOWING]
+
+
+def blocked_ids(user):
+    """Ids of the users ``user`` has blocked."""
+    return _load(user, [BLOCKED])[BLOCKED]
+
+
+def blocked_by_ids(user):
+    """Ids of the users who have blocked ``user``."""
+    return _load(user, [BLOCKED_BY])[BLOCKED_BY]
+
+
+def hidden_ids(user):
+    """Ids of users hidden from ``user`` by a block in either direction."""
+    sets = _load(user, [BLOCKED, BLOCKED_BY])
+    return sets[BLOCKED] | sets[BLOCKED_BY]
+
+
+def is_following(user, other_id):
+    return other_id in following_ids(user)
+
+
+def has_blocked(user, other_id):
+    return other_id in blocked_ids(user)
+
+
+def is_hidden(user, other_id):
+    """Whether either user has blocked the other."""
+    return other_id in hidden_ids(user)
+
+
+def followed_among(user, ids):
+    """The subset of ``ids`` that ``user`` follows."""
+    return following_ids(user).intersection(ids)
+
+
+def blocked_among(user, ids):
+    """The subset of ``ids`` that ``user`` has blocked."""
+    return blocked_ids(user).intersection(ids)
+
+
+def invalidate_follow(follower_id):
+    """Forget the cached following set after ``follower_id`` (un)follows someone."""
+    cache.delete(_key(FOLLOWING, follower_id))
+
+
+async def ainvalidate_follow(follower_id):
+    """Async version of ``invalidate_follow``."""
+    await cache.adelete(_key(FOLLOWING, follower_id))
+
+
+def invalidate_block(blocker_id, blocked_id):
+    """Forget both sides' cached block sets after a block or unblock."""
+    cache.delete_many([_key(BLOCKED, blocker_id), _key(BLOCKED_BY, blocked_id)])
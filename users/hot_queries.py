@@ -0,0 +1,38 @@
+"""Querysets behind the busiest user pages, checked by ``manage.py explain_queries``."""
+from core.plans import hot_query
+from posts.models import Block
+from . import search
+from .models import Follow, FollowSuggestion
+
+PAGE = 21
+SAMPLE_ID = 1
+
+
+@hot_query()
+def followers_page(viewer):
+    return Follow.objects.filter(following_id=SAMPLE_ID).order_by('-created_at', '-id')[:PAGE]
+
+
+@hot_query()
+def following_page(viewer):
+    return Follow.objects.filter(follower_id=SAMPLE_ID).order_by('-created_at', '-id')[:PAGE]
+
+
+@hot_query()
+def blocked_page(viewer):
+    return Block.objects.filter(blocker=viewer).order_by('-timestamp', '-id')[:PAGE]
+
+
+@hot_query()
+def graph_blocked_by(viewer):
+    return Block.objects.filter(blocked_user=viewer).values_list('blocker_id', flat=True)
+
+
+@hot_query(allow={'users_settings'})
+def user_search(viewer):
+    return search.find_users(viewer, 'sa')[:PAGE]
+
+
+@hot_query()
+def follow_suggestions(viewer):
+    return FollowSuggestion.objects.filter(user=viewer).order_by('-score')[:5]
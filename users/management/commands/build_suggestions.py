@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.suggestions import DEFAULT_FANOUT, build
+
+
+class Command(BaseCommand):
+    help = 'Recompute "people you may know" suggestions for every active user from the follow graph and post tags.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=settings.FOLLOW_SUGGESTIONS_PER_USER,
+                            help='Suggestions kept per user.')
+        parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT,
+                            help='Most recent follows expanded per user when walking friends of friends.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users whose suggestions are replaced per transaction.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = build(
+            limit=options['limit'],
+            fanout=options['fanout'],
+            batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f'  {message}'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {counts["suggestions"]} suggestions for {counts["users"]} users '
+            f'from {counts["follows"]} follows in {time.perf_counter() - start:.1f}s.'
+        ))
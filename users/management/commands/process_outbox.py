@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.notifications import flush_notifications
+from users.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Coalesce pending notifications and deliver queued emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Emails sent per mail connection.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait when the outbox is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain what is due now and exit instead of running forever.')
+
+    def handle(self, *args, **options):
+        while True:
+            flush_notifications()
+            sent, failed = deliver_pending(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
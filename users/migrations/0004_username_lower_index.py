@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        sql = 'CREATE INDEX users_username_lower_idx ON auth_user (LOWER(username) text_pattern_ops)'
+    else:
+        sql = 'CREATE INDEX users_username_lower_idx ON auth_user (LOWER(username))'
+    schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS users_username_lower_idx')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('users', '0003_delete_friend'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
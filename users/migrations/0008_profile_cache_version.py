@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_profile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 
@@ -7,6 +8,11 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    avatar_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Part of the cache key of the author header on feed cards
+    cache_version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return f"{self.user.username} Profile"
@@ -18,21 +24,108 @@ class Follow(models.Model):
     
     class Meta:
         unique_together = ('follower', 'following')
+        indexes = [
+            # Followers and following lists, newest first
+            models.Index(fields=['following', '-created_at', '-id'], name='users_follow_followers_ts'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='users_follow_following_ts'),
+        ]
     
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
 
+class FollowSuggestion(models.Model):
+    """A precomputed "people you may know" entry (see ``users.suggestions``)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    # People the user follows who follow the suggested user
+    mutual_count = models.PositiveIntegerField(default=0)
+    # Tags both users have posted under
+    shared_tags = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='users_suggestion_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.suggested_id} suggested to {self.user_id}"
+
 PRIVACY_CHOICES = [
     ('public', 'Public'),
     ('friends', 'Friends'),
     ('private', 'Private'),
 ]
 
+EMAIL_FREQUENCY_CHOICES = [
+    ('immediate', 'As it happens'),
+    ('daily', 'Daily digest'),
+    ('weekly', 'Weekly digest'),
+]
+
 class Settings(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     privacy = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='public')
     email_notifications = models.BooleanField(default=True)
     profile_visible = models.BooleanField(default=True)
+    email_frequency = models.CharField(max_length=10, choices=EMAIL_FREQUENCY_CHOICES, default='immediate')
+    last_digest_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username} Settings"
+
+class OutboxEmail(models.Model):
+    """An outgoing email queued by a request and delivered by the outbox worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='users_outbox_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} ({self.status})"
+
+class NotificationEvent(models.Model):
+    """Something that happened to a user, waiting to be emailed.
+
+    Events are grouped per recipient, verb and post when they are sent, so
+    a burst of likes turns into one email (see ``users.notifications``).
+    """
+    VERB_CHOICES = [
+        ('like', 'Like'),
+        ('comment', 'Comment'),
+        ('follow', 'Follow'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_events')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES)
+    post = models.ForeignKey('posts.Post', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivered_at', 'recipient', 'created_at'], name='users_notif_pending'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} for {self.recipient_id}"
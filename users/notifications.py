@@ -0,0 +1,200 @@
+"""Coalesced notification emails.
+
+Likes, comments and follows are recorded as ``NotificationEvent`` rows; no
+email is built in the request. ``flush_notifications`` (run by the outbox
+worker) turns them into outbox emails:
+
+* Recipients on 'immediate' get one email per (verb, post) group once the
+  group's oldest event is ``NOTIFICATION_COALESCE_WINDOW`` seconds old, e.g.
+  "alice and 37 others liked your post".
+* Recipients on 'daily' or 'weekly' get a single digest of all their pending
+  groups once per period.
+
+Events for recipients with email notifications turned off are dropped.
+
+Each recipient's emails are queued in the same transaction that marks the
+events delivered, with the events (and the digest settings row) locked
+``skip_locked``, so a crash never queues an email twice and overlapping runs
+skip what the other is already sending.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import NotificationEvent, Settings
+from .outbox import queue_mail
+
+SITE_URL = 'http://127.0.0.1:8000'
+
+DIGEST_PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+VERB_PHRASES = {
+    'like': 'liked your post',
+    'comment': 'commented on your post',
+    'follow': 'started following you',
+}
+
+
+def record(recipient, actor, verb, post=None, text=''):
+    """Record that ``actor`` did ``verb`` to ``recipient`` (and their ``post``).
+
+    Call it in the same transaction as the like, comment or follow it is
+    about, so the event is committed exactly when that write is.
+    """
+    if recipient.pk == actor.pk:
+        return
+    NotificationEvent.objects.create(
+        recipient=recipient, actor=actor, verb=verb, post=post, text=text[:500]
+    )
+
+
+def _actors_phrase(actors):
+    names = list(dict.fromkeys(actors))
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f'{names[0]} and {names[1]}'
+    return f'{names[0]} and {len(names) - 1} others'
+
+
+def _excerpt(text):
+    return f"{text[:50]}{'...' if len(text) > 50 else ''}"
+
+
+def _summarize(events):
+    """Actors phrase, summary line and link for one group of events."""
+    first = events[0]
+    actors = _actors_phrase(event.actor.username for event in events)
+    summary = f'{actors} {VERB_PHRASES[first.verb]}'
+    if first.post is not None:
+        summary += f': "{_excerpt(first.post.text)}"'
+        link = f'{SITE_URL}/posts/post/{first.post_id}/'
+    else:
+        link = f'{SITE_URL}/users/profile/{first.actor.username}/'
+    if first.verb == 'comment' and len(events) == 1 and first.text:
+        summary += f'\nComment: "{first.text}"'
+    return actors, summary, link
+
+
+def _grouped(events):
+    groups = defaultdict(list)
+    for event in events:
+        groups[(event.recipient_id, event.verb, event.post_id)].append(event)
+    return list(groups.values())
+
+
+def _pending_events(recipient_ids):
+    return (
+        NotificationEvent.objects.filter(delivered_at__isnull=True, recipient_id__in=recipient_ids)
+        .select_related('recipient', 'actor', 'post')
+        .order_by('created_at', 'pk')
+    )
+
+
+def _claim_events(recipient_ids):
+    """Lock and return the pending events, skipping rows another run holds."""
+    return list(_pending_events(recipient_ids).select_for_update(skip_locked=True, of=('self',)))
+
+
+def _mark_delivered(events, now):
+    NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(delivered_at=now)
+
+
+def _send_group(events):
+    first = events[0]
+    actors, summary, link = _summarize(events)
+    message = '\n\n'.join([
+        f'Hi {first.recipient.username},',
+        summary,
+        f'View it here: {link}',
+        'Best regards,\nSocialHub Team',
+    ])
+    queue_mail(f'{actors} {VERB_PHRASES[first.verb]}', message, [first.recipient.email])
+
+
+def _send_digest(recipient, frequency, events):
+    lines = []
+    for group in _grouped(events):
+        _, summary, link = _summarize(group)
+        lines.append(f'- {summary}\n  {link}')
+    message = '\n\n'.join([
+        f'Hi {recipient.username},',
+        'Here is what happened on SocialHub since your last digest:',
+        *lines,
+        'Best regards,\nSocialHub Team',
+    ])
+    queue_mail(f'Your SocialHub {frequency} digest', message, [recipient.email])
+
+
+def flush_notifications(now=None):
+    """Queue emails for every notification group or digest that is due.
+
+    Returns the number of emails queued.
+    """
+    now = now or timezone.now()
+    queued = 0
+
+    # Drop events for recipients who opted out of email altogether
+    muted = NotificationEvent.objects.filter(
+        delivered_at__isnull=True, recipient__settings__email_notifications=False
+    )
+    muted.update(delivered_at=now)
+
+    digest = Q(recipient__settings__email_frequency__in=DIGEST_PERIODS)
+
+    # Immediate recipients: groups whose oldest event has sat out the window
+    window = timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW)
+    due_groups = (
+        NotificationEvent.objects.filter(delivered_at__isnull=True)
+        .exclude(digest)
+        .values('recipient', 'verb', 'post')
+        .annotate(oldest=Min('created_at'))
+        .filter(oldest__lte=now - window)
+    )
+    due = defaultdict(set)
+    for group in due_groups:
+        due[group['recipient']].add((group['verb'], group['post']))
+    for recipient_id, groups in due.items():
+        with transaction.atomic():
+            for events in _grouped(_claim_events([recipient_id])):
+                if (events[0].verb, events[0].post_id) in groups:
+                    _send_group(events)
+                    _mark_delivered(events, now)
+                    queued += 1
+
+    # Digest recipients: everything pending, once per period
+    for frequency, period in DIGEST_PERIODS.items():
+        period_due = Q(last_digest_at__isnull=True) | Q(last_digest_at__lte=now - period)
+        recipients = (
+            Settings.objects.filter(period_due, email_frequency=frequency, email_notifications=True)
+            .filter(user__notification_events__delivered_at__isnull=True)
+            .annotate(oldest=Min('user__notification_events__created_at'))
+            .filter(Q(last_digest_at__isnull=False) | Q(oldest__lte=now - period))
+            .values_list('pk', flat=True)
+        )
+        for settings_id in list(recipients):
+            with transaction.atomic():
+                # Re-checked under the lock: another run may have sent it
+                user_settings = (
+                    Settings.objects.select_for_update(skip_locked=True, of=('self',))
+                    .select_related('user').filter(period_due, pk=settings_id).first()
+                )
+                if user_settings is None:
+                    continue
+                events = _claim_events([user_settings.user_id])
+                if not events:
+                    continue
+                _send_digest(user_settings.user, frequency, events)
+                _mark_delivered(events, now)
+                user_settings.last_digest_at = now
+                user_settings.save(update_fields=['last_digest_at'])
+                queued += 1
+
+    return queued
@@ -0,0 +1,97 @@
+"""Transactional email outbox.
+
+Views call ``queue_mail`` instead of ``send_mail``; that only inserts
+``OutboxEmail`` rows and never waits on SMTP. Callers wrap it and the write
+the email is about in one ``transaction.atomic()`` block, so neither is
+committed without the other. ``manage.py process_outbox`` drains the queue with
+``deliver_pending``, sending each batch over a single mail connection and
+rescheduling failures with exponential backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+# How long a claimed batch is hidden from other workers while it is sent
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def queue_mail(subject, message, recipient_list):
+    """Queue one email per recipient for the outbox worker."""
+    OutboxEmail.objects.bulk_create([
+        OutboxEmail(recipient=recipient, subject=subject, body=message)
+        for recipient in recipient_list
+        if recipient
+    ])
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return batch
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def deliver_pending(batch_size=100, connection=None):
+    """Send one batch of due emails; return (sent, failed) counts."""
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in batch:
+            _record_failure(email, exc)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [email.recipient],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                _record_failure(email, exc)
+                failed += 1
+            else:
+                email.status = 'sent'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.save(update_fields=['status', 'attempts', 'sent_at'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
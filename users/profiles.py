@@ -0,0 +1,115 @@
+"""Profile page data.
+
+``profile_user`` loads the profile owner together with their profile,
+settings and all the counts the page shows in a single query (correlated
+COUNT subqueries). Posts are paged with the feed's keyset cursor, and the
+followers, following and blocked lists are fetched by the page on demand,
+one ``PAGE_SIZE`` page at a time, so the cost of a profile does not grow
+with the size of the account.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+
+from posts.models import Block, Post
+from posts.pagination import paginate_keyset
+from . import graph
+from .models import Follow
+
+User = get_user_model()
+
+PAGE_SIZE = 20
+
+
+def _count(queryset, field):
+    """COUNT(*) of ``queryset`` rows whose ``field`` is the outer user."""
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def profile_user(username, viewer):
+    """The user named ``username`` with profile and settings joined and
+    ``posts_count`` (posts visible to ``viewer``), ``followers_count``,
+    ``following_count`` and ``blocked_count`` annotated, or None.
+
+    The follow counts leave out users hidden from ``viewer`` by a block, so
+    they match the followers and following lists.
+    """
+    is_self = viewer.is_authenticated and viewer.get_username() == username
+    hidden = graph.hidden_ids(viewer)
+    return (
+        User.objects.select_related('profile', 'settings')
+        .annotate(
+            posts_count=_count(Post.objects.visible_to(viewer, hidden), 'user'),
+            followers_count=_count(Follow.objects.exclude(follower__in=hidden), 'following'),
+            following_count=_count(Follow.objects.exclude(following__in=hidden), 'follower'),
+            # Only the owner sees their block list
+            blocked_count=_count(Block.objects.all(), 'blocker') if is_self else Value(0),
+        )
+        .filter(username=username)
+        .first()
+    )
+
+
+def posts_page(user, viewer, cursor=None):
+    """One page of ``user``'s posts visible to ``viewer`` and the next cursor."""
+    posts = user.post_set.visible_to(viewer)
+    return paginate_keyset(posts, cursor, PAGE_SIZE)
+
+
+def _user_entry(viewer, other, since, following):
+    return {
+        'id': other.pk,
+        'username': other.username,
+        'since': since.isoformat(),
+        'following': other.pk in following,
+        'is_self': other.pk == viewer.pk,
+        'profile_url': reverse('users:profile', args=[other.username]),
+        'follow_url': reverse('posts:follow_user', args=[other.pk]),
+    }
+
+
+def followers_page(user, viewer, cursor=None):
+    """A page of ``user``'s followers as JSON-ready dicts, and the next cursor."""
+    follows = (
+        Follow.objects.filter(following=user)
+        .exclude(follower__in=graph.hidden_ids(viewer))
+        .select_related('follower')
+    )
+    page, next_cursor = paginate_keyset(follows, cursor, PAGE_SIZE, key=('created_at', 'id'))
+    following = graph.followed_among(viewer, [follow.follower_id for follow in page])
+    return [_user_entry(viewer, follow.follower, follow.created_at, following) for follow in page], next_cursor
+
+
+def following_page(user, viewer, cursor=None):
+    """A page of the users ``user`` follows, as for ``followers_page``."""
+    follows = (
+        Follow.objects.filter(follower=user)
+        .exclude(following__in=graph.hidden_ids(viewer))
+        .select_related('following')
+    )
+    page, next_cursor = paginate_keyset(follows, cursor, PAGE_SIZE, key=('created_at', 'id'))
+    following = graph.followed_among(viewer, [follow.following_id for follow in page])
+    return [_user_entry(viewer, follow.following, follow.created_at, following) for follow in page], next_cursor
+
+
+def blocked_page(user, cursor=None):
+    """A page of the users ``user`` has blocked."""
+    blocks = Block.objects.filter(blocker=user).select_related('blocked_user')
+    page, next_cursor = paginate_keyset(blocks, cursor, PAGE_SIZE)
+    return [
+        {
+            'id': block.blocked_user_id,
+            'username': block.blocked_user.username,
+            'since': block.timestamp.isoformat(),
+            'unblock_url': reverse('posts:unblock_user', args=[block.blocked_user_id]),
+        }
+        for block in page
+    ], next_cursor
@@ -0,0 +1,85 @@
+"""Indexed username search.
+
+Usernames are matched by case-insensitive prefix against the
+``LOWER(username)`` expression index created by migration 0004, and profile
+visibility and blocks (from the cached ``users.graph`` sets) are applied in
+the same query, so the cost of a search does not grow with the number of
+matches.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from . import graph
+
+User = get_user_model()
+
+PAGE_SIZE = 20
+AUTOCOMPLETE_LIMIT = 8
+
+
+def _prefix(prefix):
+    if connection.vendor == 'postgresql':
+        # Served by the text_pattern_ops index
+        return Q(username_lower__startswith=prefix)
+    # A closed range on the expression index; SQLite will not use an index
+    # for LIKE on an expression.
+    return Q(username_lower__gte=prefix, username_lower__lt=prefix + '\U0010ffff')
+
+
+def find_users(viewer, query):
+    """Users whose username starts with ``query``, ordered by lowercased username and id.
+
+    Users who hid their profile, the viewer themselves, and anyone the viewer
+    blocked or was blocked by are excluded. Users without a settings row are
+    treated as visible.
+    """
+    prefix = query.strip().lower()
+    users = (
+        User.objects.annotate(username_lower=Lower('username'))
+        .filter(_prefix(prefix), is_active=True)
+        .exclude(settings__profile_visible=False)
+        .order_by('username_lower', 'pk')
+    )
+    if viewer.is_authenticated:
+        users = users.exclude(pk__in=graph.hidden_ids(viewer) | {viewer.pk})
+    return users
+
+
+def _decode_after(after):
+    """'bob|42' -> ('bob', 42); usernames differing only in case share 'bob'."""
+    name, _, pk = after.rpartition('|')
+    try:
+        return name.lower(), int(pk)
+    except ValueError:
+        return after.lower(), 0
+
+
+def search_page(viewer, query, after=None, page_size=PAGE_SIZE):
+    """One page of ``find_users`` results and the key to pass as ``after`` for the next.
+
+    The key is the last user's lowercased username and id, so users whose
+    names differ only in case are not skipped at a page boundary. Each user
+    on the page is marked with ``is_followed`` for the viewer.
+    """
+    users = find_users(viewer, query).select_related('profile')
+    if after:
+        name, pk = _decode_after(after)
+        users = users.filter(Q(username_lower__gt=name) | Q(username_lower=name, pk__gt=pk))
+    page = list(users[:page_size + 1])
+    next_after = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_after = f'{page[-1].username_lower}|{page[-1].pk}'
+    followed = graph.followed_among(viewer, [user.pk for user in page])
+    for user in page:
+        user.is_followed = user.pk in followed
+    return page, next_after
+
+
+def autocomplete(viewer, query, limit=AUTOCOMPLETE_LIMIT):
+    """Lightweight type-ahead matches as dicts of id and username."""
+    if not query.strip():
+        return []
+    return list(find_users(viewer, query).values('id', 'username')[:limit])
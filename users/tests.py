@@ -1,3 +1,164 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.replicas import PIN_COOKIE
+from core.testing import QueryBudgetMixin, make_user
+from posts.likes import _insert_like
+from posts.models import Block, Like, Post
+from posts.tags import tag_post
+from .models import Follow, NotificationEvent, OutboxEmail
+from .outbox import deliver_pending, queue_mail
+from .profiles import followers_page, following_page, profile_user
+from .search import search_page
+
+
+class ProfileQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query budgets of the profile page, for its owner and for a visitor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.visitor = make_user('visitor')
+        for index in range(8):
+            fan = make_user(f'fan{index}')
+            Follow.objects.create(follower=fan, following=cls.owner)
+            Follow.objects.create(follower=cls.owner, following=fan)
+        Block.objects.create(blocker=cls.owner, blocked_user=make_user('troll'))
+        for index in range(15):
+            post = Post.objects.create(user=cls.owner, text=f'Post {index}')
+            tag_post(post, ['django'])
+
+    def setUp(self):
+        cache.clear()
+        # Read from the primary even with DB_REPLICAS set (see posts.tests)
+        self.client.cookies[PIN_COOKIE] = '1'
+
+    def test_profile_owner(self):
+        self.client.force_login(self.owner)
+        with self.assertQueryBudget(12):
+            response = self.client.get(reverse('users:profile', args=[self.owner.username]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_visitor(self):
+        self.client.force_login(self.visitor)
+        with self.assertQueryBudget(11):
+            response = self.client.get(reverse('users:profile', args=[self.owner.username]))
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchPageTests(TestCase):
+
+    def test_pages_do_not_skip_case_variants(self):
+        for username in ['alice', 'Bob', 'bob', 'BOB', 'carol']:
+            make_user(username)
+        viewer = make_user('viewer')
+        seen, after = [], None
+        while True:
+            page, after = search_page(viewer, '', after, page_size=2)
+            seen += [user.username for user in page]
+            if after is None:
+                break
+        self.assertEqual(sorted(seen), ['BOB', 'Bob', 'alice', 'bob', 'carol'])
+        self.assertEqual(len(seen), 5)
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise OSError('SMTP unavailable')
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_DELAY=60, NOTIFICATION_COALESCE_WINDOW=0)
+class OutboxTests(TestCase):
+    """Queued emails, delivery with retries, and notifications written with
+    the action they are about. The test runner uses the locmem backend."""
+
+    def test_queue_mail_rolls_back_with_the_request(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            queue_mail('Hello', 'Body', ['a@example.com'])
+            raise RuntimeError
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_deliver_pending(self):
+        queue_mail('Hello', 'Body', ['a@example.com', 'b@example.com', ''])
+        self.assertEqual(deliver_pending(), (2, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com'])
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 2)
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        queue_mail('Hello', 'Body', ['a@example.com'])
+        for attempt, delay in [(1, 60), (2, 120)]:
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_pending(connection=FailingBackend()), (0, 1))
+            email = OutboxEmail.objects.get()
+            self.assertEqual((email.status, email.attempts), ('pending', attempt))
+            self.assertAlmostEqual(
+                (email.next_attempt_at - timezone.now()).total_seconds(), delay, delta=5
+            )
+            # Not due again until the delay has passed
+            self.assertEqual(deliver_pending(), (0, 0))
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        deliver_pending(connection=FailingBackend())
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
+        self.assertEqual(email.last_error, 'SMTP unavailable')
+
+    def test_process_outbox_once_sends_coalesced_notifications(self):
+        author = make_user('author')
+        post = Post.objects.create(user=author, text='Hello')
+        for index in range(3):
+            self.client.force_login(make_user(f'fan{index}'))
+            self.client.post(reverse('posts:like_post', args=[post.pk]))
+        self.assertEqual(NotificationEvent.objects.filter(recipient=author).count(), 3)
+        call_command('process_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('fan0 and 2 others liked your post', mail.outbox[0].subject)
+        self.assertFalse(NotificationEvent.objects.filter(delivered_at__isnull=True).exists())
+
+    def test_notification_is_written_with_the_like(self):
+        author, fan = make_user('author'), make_user('fan')
+        post = Post.objects.create(user=author, text='Hello')
+        with mock.patch('users.notifications.NotificationEvent.objects.create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                _insert_like(fan, post.pk)
+        self.assertFalse(Like.objects.exists())
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 0)
+
+    def test_follow_and_comment_notifications(self):
+        author, fan = make_user('author'), make_user('fan')
+        post = Post.objects.create(user=author, text='Hello')
+        self.client.force_login(fan)
+        self.client.post(reverse('posts:follow_user', args=[author.pk]))
+        self.client.post(reverse('posts:add_comment', args=[post.pk]), {'text': 'Nice'})
+        self.assertEqual(
+            sorted(NotificationEvent.objects.filter(recipient=author, actor=fan).values_list('verb', flat=True)),
+            ['comment', 'follow'],
+        )
+
+
+class ProfileCountTests(TestCase):
+
+    def test_counts_match_the_lists(self):
+        owner, viewer, fan, troll = (make_user(name) for name in ['owner', 'viewer', 'fan', 'troll'])
+        for other in (fan, troll):
+            Follow.objects.create(follower=other, following=owner)
+            Follow.objects.create(follower=owner, following=other)
+        Block.objects.create(blocker=viewer, blocked_user=troll)
+        cache.clear()
+        for who, expected in [(viewer, 1), (owner, 2)]:
+            user = profile_user('owner', who)
+            self.assertEqual(user.followers_count, expected)
+            self.assertEqual(user.following_count, expected)
+            self.assertEqual(len(followers_page(owner, who)[0]), expected)
+            self.assertEqual(len(following_page(owner, who)[0]), expected)
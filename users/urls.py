@@ -9,6 +9,9 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/<str:username>/', views.profile_view, name='profile'),
+    path('profile/<str:username>/followers/', views.profile_followers, name='profile_followers'),
+    path('profile/<str:username>/following/', views.profile_following, name='profile_following'),
+    path('blocked/', views.blocked_users, name='blocked_users'),
     path('settings/', views.settings_view, name='settings'),
     path('password-reset/', views.password_reset_view, name='password_reset'),
     path('password-reset/done/', auth_views.PasswordResetDoneView.as_view(template_name='users/password_reset_done.html'), name='password_reset_done'),
@@ -3,13 +3,19 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordResetForm
 from django.contrib.auth.decorators import login_required
 from .models import Profile, Settings
-from django.core.mail import send_mail
-from django.conf import settings
+from .outbox import queue_mail
+from core.images import schedule_image_processing
+from core.replicas import read_from_replica
+from . import graph, notifications, profiles
+from .suggestions import suggestions_for
 from .forms import UserRegisterForm, ProfileForm, SettingsForm, UserLoginForm
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.db import transaction
 from django.urls import reverse
 from django.template.loader import render_to_string
+from django.http import Http404, JsonResponse
+from urllib.parse import urlencode
 
 # Create your views here.
 
@@ -19,32 +25,28 @@ def register_view(request):
     if request.method == 'POST':
         form = UserRegisterForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            Profile.objects.create(user=user)
-            Settings.objects.create(user=user)
-            # Send welcome email
-            welcome_message = f"""
-            Welcome to SocialHub, {user.username}!
-            
-            Thank you for joining our community. Here's what you can do:
-            - Create and share posts with images
-            - Follow other users
-            - Like and comment on posts
-            - Search for users and content
-            - Customize your profile and privacy settings
-            
-            Get started by creating your first post!
-            
-            Best regards,
-            The SocialHub Team
-            """
-            send_mail(
-                'Welcome to SocialHub!',
-                welcome_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=True,
-            )
+            # The welcome email is queued in the same transaction as the account
+            with transaction.atomic():
+                user = form.save()
+                Profile.objects.create(user=user)
+                Settings.objects.create(user=user)
+                # Send welcome email
+                welcome_message = f"""
+                Welcome to SocialHub, {user.username}!
+                
+                Thank you for joining our community. Here's what you can do:
+                - Create and share posts with images
+                - Follow other users
+                - Like and comment on posts
+                - Search for users and content
+                - Customize your profile and privacy settings
+                
+                Get started by creating your first post!
+                
+                Best regards,
+                The SocialHub Team
+                """
+                queue_mail('Welcome to SocialHub!', welcome_message, [user.email])
             messages.success(request, 'Registration successful! Please log in.')
             return redirect('users:login')
     else:
@@ -71,20 +73,35 @@ def logout_view(request):
     return redirect('users:login')
 
 # Profile view
+@read_from_replica
 @login_required
 def profile_view(request, username):
-    user = get_object_or_404(User, username=username)
-    profile, created = Profile.objects.get_or_create(user=user)
+    # The user, their profile and settings and every count come from one query
+    user = profiles.profile_user(username, request.user)
+    if user is None:
+        raise Http404('No User matches the given query.')
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        profile = Profile.objects.create(user=user)
     
     # Get user settings to check profile visibility
     try:
-        user_settings = Settings.objects.get(user=user)
+        user_settings = user.settings
     except Settings.DoesNotExist:
         # Create settings if they don't exist
         user_settings = Settings.objects.create(user=user)
     
     is_owner = request.user == user
     
+    # Profiles are unavailable across a block in either direction
+    if not is_owner and graph.is_hidden(request.user, user.pk):
+        messages.warning(request, f"{user.username}'s profile is not available.")
+        return render(request, 'users/profile_private.html', {
+            'profile_user': user,
+            'is_owner': False
+        })
+    
     # Check if profile is visible to the current user
     if not is_owner and not user_settings.profile_visible:
         messages.warning(request, f"{user.username}'s profile is private and not visible.")
@@ -93,46 +110,20 @@ def profile_view(request, username):
             'is_owner': False
         })
     
-    # Filter posts based on privacy settings and relationship
-    all_posts = user.post_set.all()
-    posts = []
-    
-    if is_owner:
-        # Profile owner can see all their own posts
-        posts = all_posts
-    else:
-        # Filter posts based on privacy level
-        from users.models import Follow
-        for post in all_posts:
-            if user_settings.privacy == 'public':
-                posts.append(post)
-            elif user_settings.privacy == 'friends':
-                # Only show to followers
-                if Follow.objects.filter(follower=request.user, following=user).exists():
-                    posts.append(post)
-            # Private posts are not shown to others (already handled)
-    
-    # Get blocked users if the profile owner is viewing their own profile
-    blocked_users = []
-    if is_owner:
-        from posts.models import Block
-        blocked_users = Block.objects.filter(blocker=user).select_related('blocked_user')
-    
-    # Get following/followers data
-    from users.models import Follow
-    following = Follow.objects.filter(follower=user).select_related('following')
-    followers = Follow.objects.filter(following=user).select_related('follower')
-    
-    # Count stats
-    following_count = following.count()
-    followers_count = followers.count()
-    posts_count = len(posts)
+    # One page of posts; followers, following and blocked users load on demand
+    posts, next_cursor = profiles.posts_page(user, request.user, request.GET.get('cursor'))
+    next_page_url = None
+    if next_cursor:
+        next_page_url = '?' + urlencode({'cursor': next_cursor})
+    is_following = not is_owner and graph.is_following(request.user, user.pk)
     
     if is_owner:
         if request.method == 'POST':
             form = ProfileForm(request.POST, request.FILES, instance=profile)
             if form.is_valid():
-                form.save()
+                profile = form.save()
+                if 'avatar' in form.changed_data and profile.avatar:
+                    schedule_image_processing(profile, 'avatar')
                 messages.success(request, 'Profile updated!')
                 return redirect('users:profile', username=user.username)
         else:
@@ -142,16 +133,47 @@ def profile_view(request, username):
     return render(request, 'users/profile.html', {
         'profile': profile, 
         'posts': posts, 
+        'next_page_url': next_page_url,
         'is_owner': is_owner, 
+        'is_following': is_following,
         'form': form,
-        'blocked_users': blocked_users,
-        'following': following,
-        'followers': followers,
-        'following_count': following_count,
-        'followers_count': followers_count,
-        'posts_count': posts_count
+        'blocked_count': user.blocked_count,
+        'following_count': user.following_count,
+        'followers_count': user.followers_count,
+        'posts_count': user.posts_count,
+        'suggestions': suggestions_for(request.user) if is_owner else [],
     })
 
+# Followers / following / blocked lists of a profile (AJAX, paginated)
+def _visible_profile(request, username):
+    user = get_object_or_404(User.objects.select_related('settings'), username=username)
+    if request.user == user:
+        return user
+    try:
+        visible = user.settings.profile_visible
+    except Settings.DoesNotExist:
+        visible = True
+    if not visible or graph.is_hidden(request.user, user.pk):
+        raise Http404('No User matches the given query.')
+    return user
+
+@login_required
+def profile_followers(request, username):
+    user = _visible_profile(request, username)
+    results, next_cursor = profiles.followers_page(user, request.user, request.GET.get('cursor'))
+    return JsonResponse({'results': results, 'next': next_cursor})
+
+@login_required
+def profile_following(request, username):
+    user = _visible_profile(request, username)
+    results, next_cursor = profiles.following_page(user, request.user, request.GET.get('cursor'))
+    return JsonResponse({'results': results, 'next': next_cursor})
+
+@login_required
+def blocked_users(request):
+    results, next_cursor = profiles.blocked_page(request.user, request.GET.get('cursor'))
+    return JsonResponse({'results': results, 'next': next_cursor})
+
 # Settings view
 @login_required
 def settings_view(request):
@@ -184,71 +206,16 @@ def password_reset_view(request):
         form = PasswordResetForm()
     return render(request, 'users/password_reset.html', {'form': form})
 
-# Email notification functions
+# Email notification functions (coalesced by `users.notifications`, sent by `manage.py process_outbox`).
+# Call them inside the transaction of the like, comment or follow they are about.
 def send_like_notification(post, liker):
-    """Send email notification when someone likes your post"""
-    if post.user != liker and post.user.settings.email_notifications:
-        subject = f'{liker.username} liked your post'
-        message = f"""
-        Hi {post.user.username},
-        
-        {liker.username} just liked your post: "{post.text[:50]}{'...' if len(post.text) > 50 else ''}"
-        
-        View your post: http://127.0.0.1:8000/posts/post/{post.id}/
-        
-        Best regards,
-        SocialHub Team
-        """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [post.user.email],
-            fail_silently=True,
-        )
-
-def send_comment_notification(post, commenter):
-    """Send email notification when someone comments on your post"""
-    if post.user != commenter and post.user.settings.email_notifications:
-        subject = f'{commenter.username} commented on your post'
-        message = f"""
-        Hi {post.user.username},
-        
-        {commenter.username} just commented on your post: "{post.text[:50]}{'...' if len(post.text) > 50 else ''}"
-        
-        Comment: "{commenter.comment_set.last().text}"
-        
-        View your post: http://127.0.0.1:8000/posts/post/{post.id}/
-        
-        Best regards,
-        SocialHub Team
-        """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [post.user.email],
-            fail_silently=True,
-        )
+    """Notify the author that someone liked their post"""
+    notifications.record(post.user, liker, 'like', post=post)
+
+def send_comment_notification(post, commenter, comment=None):
+    """Notify the author that someone commented on their post"""
+    notifications.record(post.user, commenter, 'comment', post=post, text=comment.text if comment else '')
 
 def send_follow_notification(follower, following):
-    """Send email notification when someone follows you"""
-    if following.settings.email_notifications:
-        subject = f'{follower.username} started following you'
-        message = f"""
-        Hi {following.username},
-        
-        {follower.username} just started following you on SocialHub!
-        
-        View their profile: http://127.0.0.1:8000/users/profile/{follower.username}/
-        
-        Best regards,
-        SocialHub Team
-        """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [following.email],
-            fail_silently=True,
-        )
+    """Notify a user that someone started following them"""
+    notifications.record(following, follower, 'follow')